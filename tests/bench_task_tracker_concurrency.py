@@ -0,0 +1,98 @@
+"""Multi-process stress benchmark for task_tracker writes.
+
+Spawns N writer processes that each create tasks and walk them through
+running -> done via the CLI, then checks that no create or update was lost.
+
+Usage:
+    python tests/bench_task_tracker_concurrency.py                   # 8 writers x 10 tasks, json backend
+    python tests/bench_task_tracker_concurrency.py --writers 16 --tasks 5 --backend journal
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOL = os.path.join(PROJECT_ROOT, "tools", "task_tracker.py")
+
+
+def _cli(env, *args):
+    r = subprocess.run([sys.executable, TOOL] + list(args),
+                       capture_output=True, text=True, timeout=120, env=env)
+    if r.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed: {r.stdout}{r.stderr}")
+    return r.stdout.strip()
+
+
+def writer(job):
+    env, writer_id, tasks = job
+    ids = []
+    for i in range(tasks):
+        ids.append(_cli(env, "create", "--project", f"writer-{writer_id}",
+                        "--description", f"task {i}", "--model", "bench/model"))
+    for task_id in ids:
+        _cli(env, "update", task_id, "--state", "running")
+        _cli(env, "update", task_id, "--state", "done", "--commit", f"w{writer_id}")
+    return ids
+
+
+def run(writers, tasks, backend, tmpdir):
+    env = {**os.environ,
+           "OPENCLAW_TASKS_FILE": os.path.join(tmpdir, "tasks.json"),
+           "OPENCLAW_TASKS_BACKEND": backend}
+
+    start = time.perf_counter()
+    with Pool(writers) as pool:
+        results = pool.map(writer, [(env, w, tasks) for w in range(writers)])
+    elapsed = time.perf_counter() - start
+
+    created = [task_id for ids in results for task_id in ids]
+    stored = {}
+    for task_id in created:
+        stored[task_id] = json.loads(_cli(env, "show", task_id))
+
+    lost_creates = len(created) - len(stored)
+    lost_updates = sum(1 for t in stored.values() if t["state"] != "done" or not t["commit"])
+    duplicate_ids = len(created) - len(set(created))
+    calls = writers * tasks * 3
+    return {
+        "writers": writers,
+        "calls": calls,
+        "elapsed_s": round(elapsed, 3),
+        "calls_per_s": round(calls / elapsed, 1),
+        "lost_creates": lost_creates,
+        "lost_updates": lost_updates,
+        "duplicate_ids": duplicate_ids,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="task_tracker concurrency stress benchmark")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--tasks", type=int, default=10, help="Tasks created per writer")
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite", "journal"])
+    args = parser.parse_args()
+
+    if args.writers * args.tasks > 100:
+        print("writers x tasks must be <= 100 (the tracker keeps the last 100 tasks)")
+        sys.exit(2)
+
+    tmpdir = tempfile.mkdtemp(prefix="nasopenclaw_bench_tt_")
+    try:
+        result = run(args.writers, args.tasks, args.backend, tmpdir)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(json.dumps({"backend": args.backend, **result}, indent=2))
+    ok = not (result["lost_creates"] or result["lost_updates"] or result["duplicate_ids"])
+    print("No lost updates." if ok else "LOST UPDATES DETECTED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Serial vs parallel hashing benchmark for validate_shared_files.
+
+Builds synthetic src/lib + src/pages trees and times a full (cache-less)
+hash of the protected files with one worker and with N workers.
+
+Usage:
+    python tests/bench_validate_shared_files_hashing.py                     # 1k and 10k files
+    python tests/bench_validate_shared_files_hashing.py --files 1000 10000 100000 --workers 16
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "tools"))
+
+import validate_shared_files as vsf  # noqa: E402
+
+
+def build_tree(root, count, size):
+    """Spread count files of roughly size bytes over nested directories."""
+    payload = os.urandom(size)
+    for i in range(count):
+        top = "src/lib" if i % 2 else "src/pages"
+        d = os.path.join(root, top, f"d{i % 64:02d}", f"e{i % 7}")
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f"f{i}.ts"), "wb") as f:
+            f.write(payload + i.to_bytes(4, "little"))
+
+
+def time_hash(root, workers, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        files = vsf.get_all_protected_files(root, paranoid=True, workers=workers)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, files
+
+
+def run(count, size, workers, repeat):
+    tmpdir = tempfile.mkdtemp(prefix="nasopenclaw_bench_vsf_")
+    try:
+        build_tree(tmpdir, count, size)
+        serial, a = time_hash(tmpdir, 1, repeat)
+        parallel, b = time_hash(tmpdir, workers, repeat)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    if a != b:
+        raise RuntimeError("serial and parallel hashes differ")
+    return {
+        "files": count,
+        "file_bytes": size,
+        "workers": workers,
+        "serial_s": round(serial, 3),
+        "parallel_s": round(parallel, 3),
+        "speedup": round(serial / parallel, 2) if parallel else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="validate_shared_files hashing benchmark")
+    parser.add_argument("--files", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--size", type=int, default=4096, help="Bytes per synthetic file")
+    parser.add_argument("--workers", type=int, default=vsf.DEFAULT_WORKERS)
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N timing")
+    args = parser.parse_args()
+
+    for count in args.files:
+        print(json.dumps(run(count, args.size, args.workers, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Micro-benchmark of the SHA-256 read strategies used by validate_shared_files.
+
+For each file size, times a single read(), the chunked loop,
+hashlib.file_digest (Python 3.11+) and mmap, then reports the smallest size
+at which mmap beats the chunked reader. That crossover is what
+MMAP_THRESHOLD in tools/validate_shared_files.py should be set to.
+
+Usage:
+    python tests/bench_validate_shared_files_mmap.py
+    python tests/bench_validate_shared_files_mmap.py --sizes 1M 4M 16M 64M --repeat 20
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "tools"))
+
+import validate_shared_files as vsf  # noqa: E402
+
+
+def read_all(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def chunked(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(vsf.LARGE_CHUNK):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def mapped(path):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return hashlib.sha256(mm).hexdigest()
+
+
+STRATEGIES = {"read": read_all, "chunked": chunked, "mmap": mapped}
+if hasattr(hashlib, "file_digest"):
+    STRATEGIES["file_digest"] = file_digest
+
+
+def parse_size(text):
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = text.upper()
+    return int(text[:-1]) * units[text[-1]] if text[-1] in units else int(text)
+
+
+def best_of(fn, path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="validate_shared_files hash strategy benchmark")
+    parser.add_argument("--sizes", nargs="+", default=["64K", "256K", "1M", "4M", "16M", "64M"])
+    parser.add_argument("--repeat", type=int, default=10, help="Best-of-N timing")
+    args = parser.parse_args()
+
+    crossover = None
+    with tempfile.TemporaryDirectory(prefix="nasopenclaw_bench_mmap_") as tmpdir:
+        for size in map(parse_size, args.sizes):
+            path = os.path.join(tmpdir, f"blob_{size}")
+            with open(path, "wb") as f:
+                f.write(os.urandom(size))
+            expected = read_all(path)
+            row = {"bytes": size}
+            for name, fn in STRATEGIES.items():
+                if fn(path) != expected:
+                    raise RuntimeError(f"{name} produced a different hash")
+                seconds = best_of(fn, path, args.repeat)
+                row[f"{name}_MBps"] = round(size / seconds / (1 << 20), 1)
+            print(json.dumps(row))
+            if crossover is None and row["mmap_MBps"] > row["chunked_MBps"]:
+                crossover = size
+            os.remove(path)
+
+    print(f"mmap beats the chunked reader from {crossover} bytes"
+          if crossover else "mmap never beat the chunked reader")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 import json
 import os
 import shutil
+import signal
 import subprocess
 import sys
 import tempfile
+import time
 import unittest
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -17,10 +19,30 @@ class TestRunTests(unittest.TestCase):
 
     def tearDown(self):
         shutil.rmtree(self.tmpdir, ignore_errors=True)
+        shutil.rmtree(self._history_dir(), ignore_errors=True)
+        shutil.rmtree(self._log_dir(), ignore_errors=True)
 
-    def _run(self, *args):
+    def _run(self, *args, env=None):
         cmd = [sys.executable, TOOL] + list(args)
-        return subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        env = {**os.environ, "OPENCLAW_SSH_CONTROL_DIR": os.path.join(self.tmpdir, ".mux"),
+               "OPENCLAW_TEST_HISTORY_DIR": self._history_dir(),
+               "OPENCLAW_TEST_LOG_DIR": self._log_dir(), **(env or {})}
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=60, env=env)
+
+    def _history_dir(self):
+        return self.tmpdir + "_history"
+
+    def _log_dir(self):
+        return self.tmpdir + "_logs"
+
+    def _history(self):
+        d = self._history_dir()
+        files = os.listdir(d) if os.path.isdir(d) else []
+        self.assertLessEqual(len(files), 1)
+        if not files:
+            return []
+        with open(os.path.join(d, files[0])) as f:
+            return [json.loads(line) for line in f]
 
     def _make_project(self, scripts):
         pkg = {"name": "test-proj", "scripts": scripts}
@@ -75,19 +97,215 @@ class TestRunTests(unittest.TestCase):
         self.assertEqual(r.returncode, 1)
         self.assertNotIn("SHOULD-NOT-RUN", r.stdout)
 
-    def test_all_suites_order_unit_build_integration(self):
+    def test_all_suites_integration_after_build(self):
         self._make_project({
             "test:unit": "echo STEP1 && exit 0",
-            "build": "echo STEP2 && exit 0",
+            "build": "sleep 0.3 && echo STEP2 && exit 0",
             "test:integration": "echo STEP3 && exit 0",
         })
         r = self._run(self.tmpdir, "all")
-        pos1 = r.stdout.find("STEP1")
+        self.assertEqual(r.returncode, 0)
         pos2 = r.stdout.find("STEP2")
         pos3 = r.stdout.find("STEP3")
-        self.assertGreater(pos2, pos1, "build should run after unit")
+        self.assertGreater(pos2, -1)
         self.assertGreater(pos3, pos2, "integration should run after build")
 
+    def test_unit_and_build_run_concurrently(self):
+        # Each suite waits for the other's marker, so only overlap can pass
+        wait = "i=0; while [ ! -f {m} ] && [ $i -lt 100 ]; do sleep 0.05; i=$((i+1)); done; test -f {m}"
+        self._make_project({
+            "test:unit": f"touch unit.started && {wait.format(m='build.started')}",
+            "build": f"touch build.started && {wait.format(m='unit.started')}",
+            "test:integration": "echo i-ok",
+        })
+        r = self._run(self.tmpdir, "all")
+        self.assertEqual(r.returncode, 0, r.stdout)
+
+    def test_output_prefixed_per_suite(self):
+        self._make_project({"test:unit": "echo hello-unit", "build": "echo hello-build"})
+        r = self._run(self.tmpdir, "all")
+        self.assertIn("[unit] hello-unit", r.stdout)
+        self.assertIn("[build] hello-build", r.stdout)
+
+    def test_failure_cancels_running_sibling(self):
+        self._make_project({
+            "test:unit": "sleep 0.2 && exit 1",
+            "build": "sleep 20 && echo BUILD-$((40+2))",
+            "test:integration": "echo SHOULD-NOT-RUN",
+        })
+        r = self._run(self.tmpdir, "all")
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("Unit tests failed", r.stdout)
+        self.assertNotIn("BUILD-42", r.stdout)
+        self.assertNotIn("SHOULD-NOT-RUN", r.stdout)
+
+    # ── Result cache ────────────────────────────────────────────────────
+
+    def _counting_project(self, exit_code=0):
+        """A unit suite that appends to a counter file outside the project."""
+        counter = os.path.join(tempfile.mkdtemp(prefix="nasopenclaw_test_rt_cnt_"), "runs")
+        self.addCleanup(shutil.rmtree, os.path.dirname(counter), True)
+        self._make_project({"test:unit": f"echo run >> {counter} && exit {exit_code}"})
+        with open(os.path.join(self.tmpdir, "index.ts"), "w") as f:
+            f.write("export const a = 1;\n")
+        return lambda: open(counter).read().count("run") if os.path.exists(counter) else 0
+
+    def test_cache_replays_pass_on_unchanged_tree(self):
+        runs = self._counting_project()
+        self.assertEqual(self._run(self.tmpdir, "unit").returncode, 0)
+        r = self._run(self.tmpdir, "unit")
+        self.assertEqual(r.returncode, 0)
+        self.assertIn("passed successfully (cached)", r.stdout)
+        self.assertEqual(runs(), 1)
+        with open(os.path.join(self.tmpdir, ".gitignore")) as f:
+            self.assertIn(".openclaw_testcache.json", f.read().splitlines())
+
+    def test_cache_invalidated_by_source_change(self):
+        runs = self._counting_project()
+        self._run(self.tmpdir, "unit")
+        with open(os.path.join(self.tmpdir, "index.ts"), "w") as f:
+            f.write("export const a = 2;\n")
+        r = self._run(self.tmpdir, "unit")
+        self.assertNotIn("(cached)", r.stdout)
+        self.assertEqual(runs(), 2)
+
+    def test_cache_not_fooled_by_same_size_edit_during_run(self):
+        os.makedirs(os.path.join(self.tmpdir, "src"))
+        with open(os.path.join(self.tmpdir, "src", "a.ts"), "w") as f:
+            f.write("A")
+        # Rewrites the file in place (same size, inode and mtime) once the
+        # run has gone on longer than the racy window
+        with open(os.path.join(self.tmpdir, "edit.sh"), "w") as f:
+            f.write("sleep 2.5\ntouch -r src/a.ts .ref\nprintf B > src/a.ts\n"
+                    "touch -r .ref src/a.ts\nrm .ref\n")
+        self._make_project({"test:unit": "sh edit.sh"})
+        self._run(self.tmpdir, "unit")
+        r = self._run(self.tmpdir, "unit")
+        self.assertNotIn("(cached)", r.stdout)
+
+    def test_cache_ignores_node_modules(self):
+        runs = self._counting_project()
+        self._run(self.tmpdir, "unit")
+        os.makedirs(os.path.join(self.tmpdir, "node_modules", "pkg"))
+        with open(os.path.join(self.tmpdir, "node_modules", "pkg", "x.js"), "w") as f:
+            f.write("x")
+        self.assertIn("(cached)", self._run(self.tmpdir, "unit").stdout)
+        self.assertEqual(runs(), 1)
+
+    def test_no_cache_flag_reruns(self):
+        runs = self._counting_project()
+        self._run(self.tmpdir, "unit")
+        r = self._run(self.tmpdir, "unit", "--no-cache")
+        self.assertNotIn("(cached)", r.stdout)
+        self.assertEqual(runs(), 2)
+
+    def test_failures_are_not_cached(self):
+        runs = self._counting_project(exit_code=1)
+        self._run(self.tmpdir, "unit")
+        r = self._run(self.tmpdir, "unit")
+        self.assertEqual(r.returncode, 1)
+        self.assertEqual(runs(), 2)
+
+    def test_cached_build_unblocks_integration(self):
+        self._make_project({"test:unit": "echo u", "build": "echo b", "test:integration": "echo i"})
+        self._run(self.tmpdir, "build")
+        r = self._run(self.tmpdir, "all")
+        self.assertEqual(r.returncode, 0)
+        self.assertIn("build passed successfully (cached)", r.stdout)
+        self.assertIn("Result: integration passed successfully (", r.stdout)
+
+    # ── Timing history ──────────────────────────────────────────────────
+
+    def test_result_reports_wall_cpu_and_rss(self):
+        self._make_project({"test:unit": "echo ok"})
+        r = self._run(self.tmpdir, "unit")
+        self.assertRegex(r.stdout, r"unit passed successfully \(\d+\.\ds, cpu \d+\.\ds, peak \d+ MB\)")
+        [entry] = self._history()
+        self.assertEqual((entry["suite"], entry["status"], entry["remote"]), ("unit", "passed", False))
+        self.assertGreater(entry["wall_s"], 0)
+        self.assertGreater(entry["peak_rss_mb"], 0)
+        self.assertIsNotNone(entry["cpu_s"])
+
+    def test_history_records_failure_but_not_cancelled_siblings(self):
+        self._make_project({"test:unit": "exit 1", "build": "sleep 20"})
+        self._run(self.tmpdir, "all")
+        self.assertEqual([(e["suite"], e["status"]) for e in self._history()], [("unit", "failed")])
+
+    def test_cached_results_are_not_recorded(self):
+        self._make_project({"test:unit": "echo ok"})
+        self._run(self.tmpdir, "unit")
+        self._run(self.tmpdir, "unit")
+        self.assertEqual(len(self._history()), 1)
+
+    def test_report_without_history(self):
+        r = self._run(self.tmpdir, "report")
+        self.assertEqual(r.returncode, 0)
+        self.assertIn("No test history", r.stdout)
+
+    def test_report_flags_regression_against_rolling_median(self):
+        self._make_project({"test:unit": "echo ok", "build": "echo ok"})
+        self._run(self.tmpdir, "unit")
+        path = os.path.join(self._history_dir(), os.listdir(self._history_dir())[0])
+        with open(path, "w") as f:
+            for wall in (1.0, 1.1, 0.9, 1.0, 3.0):
+                f.write(json.dumps({"at": "2026-01-01T00:00:00+00:00", "suite": "build",
+                                    "status": "passed", "remote": False, "wall_s": wall,
+                                    "cpu_s": 0.5, "peak_rss_mb": 100.0}) + "\n")
+            f.write(json.dumps({"at": "2026-01-01T00:00:00+00:00", "suite": "unit",
+                                "status": "passed", "remote": False, "wall_s": 2.0,
+                                "cpu_s": 1.0, "peak_rss_mb": 50.0}) + "\n")
+        r = self._run(self.tmpdir, "report")
+        self.assertEqual(r.returncode, 0)
+        self.assertIn("3.00x", r.stdout)
+        self.assertIn("REGRESSION", r.stdout)
+        self.assertIn("Regressions (> 1.5x rolling median): build", r.stdout)
+        self.assertIn("no baseline yet", r.stdout)
+
+    # ── Sharding ────────────────────────────────────────────────────────
+
+    def test_unit_suite_sharded_and_merged(self):
+        self._make_project({"test:unit": "echo shard-run", "build": "echo build-run",
+                            "test:integration": "echo int-run"})
+        r = self._run(self.tmpdir, "all", "--shards", "3")
+        self.assertEqual(r.returncode, 0, r.stdout)
+        for i in (1, 2, 3):
+            self.assertIn(f"[unit {i}/3] shard-run --shard={i}/3 "
+                          f"--maxWorkers={max(1, (os.cpu_count() or 1) // 3)}", r.stdout)
+        self.assertIn("Result: unit passed successfully (3 shards,", r.stdout)
+        self.assertIn("[build] build-run", r.stdout)
+        self.assertNotIn("build-run --shard", r.stdout)
+        [unit] = [e for e in self._history() if e["suite"] == "unit"]
+        self.assertEqual(unit["shards"], 3)
+
+    def test_failing_shard_fails_suite(self):
+        self._make_project({"test:unit": "sh -c 'test \"$1\" != --shard=2/3' x"})
+        r = self._run(self.tmpdir, "unit", "--shards", "3")
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("Result: unit 2/3 failed", r.stdout)
+        self.assertIn("Unit tests failed", r.stdout)
+
+    def test_shards_auto(self):
+        self._make_project({"test:unit": "echo ok"})
+        r = self._run(self.tmpdir, "unit", "--shards", "auto")
+        self.assertEqual(r.returncode, 0)
+        self.assertIn("unit passed successfully", r.stdout)
+
+    def test_shards_auto_capped_at_test_file_count(self):
+        self._make_project({"test:unit": "echo auto-run"})
+        os.makedirs(os.path.join(self.tmpdir, "src"))
+        with open(os.path.join(self.tmpdir, "src", "math.test.ts"), "w") as f:
+            f.write("")
+        r = self._run(self.tmpdir, "unit", "--shards", "auto")
+        self.assertEqual(r.returncode, 0, r.stdout)
+        self.assertIn("[unit] auto-run", r.stdout)
+        self.assertNotIn("--shard=", r.stdout)
+
+    def test_invalid_shard_count_rejected(self):
+        self._make_project({"test:unit": "echo ok"})
+        r = self._run(self.tmpdir, "unit", "--shards", "0")
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("--shards", r.stdout)
+
     # ── Output labels ───────────────────────────────────────────────────
 
     def test_output_includes_suite_labels(self):
@@ -101,6 +319,142 @@ class TestRunTests(unittest.TestCase):
         self.assertIn("build", r.stdout.lower())
         self.assertIn("integration", r.stdout.lower())
 
+    # ── Output capture ──────────────────────────────────────────────────
+
+    def _noisy_project(self, fail):
+        script = ["for i in $(seq 1 500); do echo progress-line-$i; done",
+                  "echo ' FAIL  src/math.test.ts > adds numbers'",
+                  "echo 'AssertionError: expected 1 to be 2'"]
+        script += [f"echo '    at frame{i} (src/math.test.ts:{i}:1)'" for i in range(1, 21)]
+        script += ["echo", "echo done-line", f"exit {1 if fail else 0}"]
+        with open(os.path.join(self.tmpdir, "noisy.sh"), "w") as f:
+            f.write("\n".join(script) + "\n")
+        self._make_project({"test:unit": "sh noisy.sh"})
+
+    def test_capture_hides_output_of_passing_suite(self):
+        self._noisy_project(fail=False)
+        r = self._run(self.tmpdir, "unit", "--capture")
+        self.assertEqual(r.returncode, 0, r.stdout)
+        self.assertIn("Result: unit passed successfully", r.stdout)
+        self.assertNotIn("progress-line", r.stdout)
+        self.assertNotIn("failure summary", r.stdout)
+
+    def test_capture_summarises_failure(self):
+        self._noisy_project(fail=True)
+        r = self._run(self.tmpdir, "unit", "--capture")
+        self.assertEqual(r.returncode, 1)
+        out = r.stdout
+        self.assertIn("--- unit failure summary", out)
+        self.assertIn("FAIL  src/math.test.ts > adds numbers", out)
+        self.assertIn("AssertionError: expected 1 to be 2", out)
+        errors = out.split("Errors:")[1].split("Last 40 lines:")[0]
+        self.assertIn("at frame5 ", errors)
+        self.assertNotIn("at frame6 ", errors)
+        self.assertIn("done-line", out)
+        self.assertNotIn("progress-line-400\n", out)
+        self.assertLess(len(out.splitlines()), 120)
+        log = out.split("Full log: ")[1].splitlines()[0]
+        self.assertTrue(log.startswith(self._log_dir()))
+        with open(log) as f:
+            full = f.read()
+        self.assertIn("progress-line-1\n", full)
+        self.assertIn("at frame20 ", full)
+
+    def test_capture_log_does_not_invalidate_cache(self):
+        self._noisy_project(fail=False)
+        self._run(self.tmpdir, "unit", "--capture")
+        r = self._run(self.tmpdir, "unit", "--capture")
+        self.assertIn("(cached)", r.stdout)
+
+    # ── Timeouts and cancellation ───────────────────────────────────────
+
+    def _script(self, name, body):
+        with open(os.path.join(self.tmpdir, name), "w") as f:
+            f.write(body)
+
+    def _assert_dead(self, pidfile):
+        with open(os.path.join(self.tmpdir, pidfile)) as f:
+            pid = int(f.read())
+        for _ in range(50):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return
+            time.sleep(0.1)
+        os.kill(pid, signal.SIGKILL)
+        self.fail(f"process {pid} outlived the run")
+
+    def test_suite_timeout_fails_suite(self):
+        self._make_project({"test:unit": "echo started; sleep 60"})
+        start = time.monotonic()
+        r = self._run(self.tmpdir, "unit", "--timeout", "1", "--idle-timeout", "0")
+        self.assertLess(time.monotonic() - start, 20)
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("Stopping unit: timed out after 1s.", r.stdout)
+        self.assertIn("Result: unit timed out after 1s (", r.stdout)
+        self.assertEqual(self._history()[0]["status"], "timeout")
+
+    def test_idle_timeout_fails_quiet_suite(self):
+        self._make_project({"test:unit": "echo started; sleep 60"})
+        r = self._run(self.tmpdir, "unit", "--idle-timeout", "1")
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("Result: unit timed out with no output for 1s", r.stdout)
+
+    def test_chatty_suite_is_not_idle(self):
+        self._make_project({"test:unit": "for i in 1 2 3 4 5 6; do echo tick; sleep 0.4; done"})
+        r = self._run(self.tmpdir, "unit", "--idle-timeout", "1")
+        self.assertEqual(r.returncode, 0, r.stdout)
+
+    def test_sigterm_ignored_escalates_to_sigkill_on_whole_group(self):
+        # A "dev server" in the background that shrugs off SIGTERM and keeps
+        # the output pipe open
+        self._script("server.sh", "trap '' TERM\necho $$ > server.pid\n"
+                                  "while :; do sleep 0.1; done\n")
+        self._make_project({"test:integration": "sh server.sh & sleep 60"})
+        start = time.monotonic()
+        r = self._run(self.tmpdir, "integration", "--timeout", "1", "--kill-grace", "1")
+        self.assertLess(time.monotonic() - start, 20)
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("Result: integration timed out after 1s", r.stdout)
+        self._assert_dead("server.pid")
+
+    def test_per_suite_timeout_reports_partial_results(self):
+        self._make_project({"test:unit": "echo u-ok", "build": "sleep 60",
+                            "test:integration": "echo int-ok"})
+        r = self._run(self.tmpdir, "all", "--timeout", "build=1")
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("Summary: unit passed, build timed out after 1s, integration not run",
+                      r.stdout)
+        self.assertIn("Build tests failed", r.stdout)
+
+    def test_sigterm_to_runner_stops_suites_and_reports(self):
+        self._script("hang.sh", "echo $$ > hang.pid\necho hanging\nsleep 60\n")
+        self._make_project({"test:unit": "echo u-ok", "build": "sh hang.sh",
+                            "test:integration": "echo int-ok"})
+        env = {**os.environ, "OPENCLAW_SSH_CONTROL_DIR": os.path.join(self.tmpdir, ".mux"),
+               "OPENCLAW_TEST_HISTORY_DIR": self._history_dir(),
+               "OPENCLAW_TEST_LOG_DIR": self._log_dir()}
+        proc = subprocess.Popen([sys.executable, TOOL, self.tmpdir, "all", "--no-cache"],
+                                stdout=subprocess.PIPE, text=True, env=env)
+        seen = set()
+        for line in proc.stdout:
+            seen.update(k for k in ("hanging", "Result: unit passed") if k in line)
+            if len(seen) == 2:
+                break
+        proc.send_signal(signal.SIGTERM)
+        out, _ = proc.communicate(timeout=30)
+        self.assertEqual(proc.returncode, 130)
+        self.assertIn("Interrupted; stopping running suites", out)
+        self.assertIn("Summary: unit passed, build interrupted, integration not run", out)
+        self._assert_dead("hang.pid")
+
+    def test_invalid_timeout_rejected(self):
+        self._make_project({"test:unit": "echo ok"})
+        for bad in ("soon", "-1", "lint=5"):
+            r = self._run(self.tmpdir, "unit", "--timeout", bad)
+            self.assertEqual(r.returncode, 1)
+            self.assertIn("invalid --timeout", r.stdout)
+
     # ── Error handling ──────────────────────────────────────────────────
 
     def test_invalid_suite_rejected(self):
@@ -119,5 +473,88 @@ class TestRunTests(unittest.TestCase):
         self.assertIn("remote", r.stdout.lower())
 
 
+    def _fake_ssh(self, fail_master=False):
+        """An ssh stand-in that logs its argv and runs the command locally."""
+        tooldir = tempfile.mkdtemp(prefix="nasopenclaw_test_rt_ssh_")
+        self.addCleanup(shutil.rmtree, tooldir, True)
+        log = os.path.join(tooldir, "calls.jsonl")
+        script = os.path.join(tooldir, "fake_ssh.py")
+        with open(script, "w") as f:
+            f.write(FAKE_SSH)
+        env = {"OPENCLAW_SSH": f"{sys.executable} {script}", "FAKE_SSH_LOG": log}
+        if fail_master:
+            env["FAKE_SSH_FAIL_MASTER"] = "1"
+
+        def calls():
+            with open(log) as f:
+                return [json.loads(line) for line in f]
+        return env, calls
+
+    def test_ssh_suites_share_one_master_connection(self):
+        self._make_project({"test:unit": "echo u-ok", "build": "echo b-ok",
+                            "test:integration": "echo i-ok"})
+        env, calls = self._fake_ssh()
+        r = self._run(self.tmpdir, "all", "--ssh", "user@host", env=env)
+        self.assertEqual(r.returncode, 0, r.stdout)
+        self.assertIn("shared connection", r.stdout)
+        self.assertIn("[integration] i-ok", r.stdout)
+        argvs = calls()
+        self.assertEqual(len(argvs), 4)
+        masters = [a for a in argvs if "ControlMaster=auto" in a]
+        self.assertEqual(len(masters), 1)
+        self.assertEqual(masters[0][-1], "exit")
+        self.assertEqual(argvs[0], masters[0], "master must be opened before suites start")
+        for argv in argvs:
+            self.assertTrue(any(a.startswith("ControlPath=") for a in argv))
+            self.assertEqual(argv[-2], "user@host")
+        self.assertTrue(all(a[-1].startswith(f"cd {self.tmpdir} && npm run") for a in argvs[1:]))
+
+    def test_ssh_timeout_ends_remote_command(self):
+        with open(os.path.join(self.tmpdir, "hang.sh"), "w") as f:
+            f.write("echo $$ > hang.pid\necho hanging\nsleep 60\n")
+        self._make_project({"test:unit": "sh hang.sh"})
+        env, calls = self._fake_ssh()
+        r = self._run(self.tmpdir, "unit", "--ssh", "user@host", "--timeout", "1",
+                      "--kill-grace", "1", env=env)
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("Result: unit timed out after 1s", r.stdout)
+        self.assertIn("-tt", calls()[-1])
+        self._assert_dead("hang.pid")
+
+    def test_ssh_master_failure_falls_back_to_direct_connections(self):
+        self._make_project({"test:unit": "echo u-ok"})
+        env, calls = self._fake_ssh(fail_master=True)
+        r = self._run(self.tmpdir, "unit", "--ssh", "user@host", env=env)
+        self.assertEqual(r.returncode, 0)
+        self.assertIn("Warning", r.stdout)
+        self.assertIn("u-ok", r.stdout)
+
+
+FAKE_SSH = """
+import json, os, subprocess, sys
+HANGUP = ("import os, signal, sys\\n"
+          "sys.stdin.buffer.read()\\n"
+          "try: os.killpg(int(sys.argv[1]), signal.SIGHUP)\\n"
+          "except OSError: pass\\n")
+args = sys.argv[1:]
+with open(os.environ["FAKE_SSH_LOG"], "a") as f:
+    f.write(json.dumps(args) + "\\n")
+while args and args[0].startswith("-"):
+    args = args[2:] if args[0] == "-o" else args[1:]
+target, command = args[0], " ".join(args[1:])
+if command == "exit":
+    sys.exit(255 if os.environ.get("FAKE_SSH_FAIL_MASTER") else 0)
+# The "remote" command runs outside our process group, as it would on the
+# host; only a pty session (-tt) is hung up when this client goes away
+remote = subprocess.Popen(["bash", "-c", command], start_new_session=True)
+if "-tt" in sys.argv:
+    r, w = os.pipe()
+    subprocess.Popen([sys.executable, "-c", HANGUP, str(remote.pid)], stdin=r,
+                     start_new_session=True)
+    os.close(r)
+sys.exit(remote.wait())
+"""
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,12 +1,24 @@
+import gzip
 import json
 import os
 import re
 import shutil
+import socket
+import sqlite3
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import unittest
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from tests.bench_task_tracker_concurrency import run as run_stress
+
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TOOL = os.path.join(PROJECT_ROOT, "tools", "task_tracker.py")
 
@@ -41,7 +53,38 @@ class TestTaskTracker(unittest.TestCase):
 
     def test_create_id_matches_pattern(self):
         task_id = self._create()
-        self.assertRegex(task_id, r"^task_\d{8}_\d{6}_\d{3}$")
+        self.assertRegex(task_id, r"^task_\d{8}_\d{6}$")
+
+    def test_create_ids_count_up_per_day(self):
+        ids = [self._create() for _ in range(3)]
+        day = ids[0][len("task_"):len("task_") + 8]
+        self.assertEqual(ids, [f"task_{day}_{n:06d}" for n in (1, 2, 3)])
+        # Id order is creation order
+        self.assertEqual(sorted(ids), [t["id"] for t in self._load()])
+
+    def test_create_day_is_utc(self):
+        task_id = self._create()
+        t = self._load()[0]
+        self.assertEqual(task_id[5:13], t["created_at"][:10].replace("-", ""))
+
+    def test_counter_seeded_from_existing_ids(self):
+        first = self._create()
+        os.remove(os.path.join(self.tmpdir, ".tasks.seq"))
+        second = self._create()
+        self.assertNotEqual(first, second)
+        self.assertTrue(second.endswith("_000002"), second)
+
+    def test_counter_for_later_day_does_not_reset_today(self):
+        first = self._create()
+        day = first[len("task_"):len("task_") + 8]
+        tomorrow = str(int(day) + 1)
+        # Another writer already allocated on the next day (old single-day format)
+        with open(os.path.join(self.tmpdir, ".tasks.seq"), "w") as f:
+            json.dump({"day": tomorrow, "n": 1}, f)
+        second = self._create()
+        self.assertEqual(second, f"task_{day}_000002")
+        with open(os.path.join(self.tmpdir, ".tasks.seq")) as f:
+            self.assertEqual(json.load(f)["days"], {day: 2, tomorrow: 1})
 
     def test_create_writes_correct_fields(self):
         self._create(project="myproj", desc="my desc", model="gpt-4")
@@ -175,5 +218,874 @@ class TestTaskTracker(unittest.TestCase):
         self.assertNotEqual(r.returncode, 0)
 
 
+class TestTaskTrackerBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="nasopenclaw_test_tt_batch_")
+        self.tasks_file = os.path.join(self.tmpdir, "tasks.json")
+        self.env = {**os.environ, "OPENCLAW_TASKS_FILE": self.tasks_file}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _run(self, *args, stdin="", backend="json"):
+        cmd = [sys.executable, TOOL] + list(args)
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=30, input=stdin,
+                              env={**self.env, "OPENCLAW_TASKS_BACKEND": backend})
+
+    def _batch(self, ops, backend="json"):
+        stdin = "".join((op if isinstance(op, str) else json.dumps(op)) + "\n" for op in ops)
+        r = self._run("batch", stdin=stdin, backend=backend)
+        return r, [json.loads(l) for l in r.stdout.splitlines()]
+
+    def _creates(self, n):
+        return [{"op": "create", "project": f"p{i}", "description": "d", "model": "m"} for i in range(n)]
+
+    def test_creates_return_ids_in_order(self):
+        for backend in ("json", "sqlite", "journal"):
+            with self.subTest(backend=backend):
+                r, results = self._batch(self._creates(3), backend=backend)
+                self.assertEqual(r.returncode, 0, r.stdout + r.stderr)
+                self.assertEqual([res["status"] for res in results], ["created"] * 3)
+                listed = self._run("list", "--format", "jsonl", backend=backend).stdout
+                for res in results:
+                    self.assertIn(res["id"], listed)
+
+    def test_updates_apply(self):
+        for backend in ("json", "sqlite", "journal"):
+            with self.subTest(backend=backend):
+                _, created = self._batch(self._creates(2), backend=backend)
+                r, results = self._batch([
+                    {"op": "update", "id": created[0]["id"], "state": "running"},
+                    {"op": "update", "id": created[1]["id"], "state": "failed", "error": "boom"},
+                ], backend=backend)
+                self.assertEqual([res["status"] for res in results], ["updated", "updated"])
+                shown = json.loads(self._run("show", created[1]["id"], backend=backend).stdout)
+                self.assertEqual(shown["state"], "failed")
+                self.assertEqual(shown["error"], "boom")
+
+    def _next_id(self, task_id):
+        prefix, n = task_id.rsplit("_", 1)
+        return f"{prefix}_{int(n) + 1:0{len(n)}d}"
+
+    def test_create_then_update_in_one_batch_journal(self):
+        _, [first] = self._batch(self._creates(1), backend="journal")
+        task_id = self._next_id(first["id"])
+        r, results = self._batch(self._creates(1) + [
+            {"op": "update", "id": task_id, "state": "running"},
+            {"op": "update", "id": task_id, "state": "done"},
+        ], backend="journal")
+        self.assertEqual(results[0]["id"], task_id, "created on a different day; rerun")
+        shown = json.loads(self._run("show", task_id, backend="journal").stdout)
+        self.assertEqual([t["state"] for t in shown["transitions"]], ["queued", "running", "done"])
+
+    def test_journal_replay_over_compacted_snapshot_is_idempotent(self):
+        _, [created] = self._batch(self._creates(1), backend="journal")
+        self._run("compact", backend="journal")
+        self._batch([{"op": "update", "id": created["id"], "state": "running"},
+                     {"op": "update", "id": created["id"], "state": "done"}], backend="journal")
+        journal = os.path.join(self.tmpdir, "tasks.journal.jsonl")
+        with open(journal) as f:
+            events = f.read()
+        # Crash between writing the snapshot and truncating the journal
+        self._run("compact", backend="journal")
+        with open(journal, "w") as f:
+            f.write(events)
+        shown = json.loads(self._run("show", created["id"], backend="journal").stdout)
+        self.assertEqual([t["state"] for t in shown["transitions"]], ["queued", "running", "done"])
+
+    def test_single_write_for_whole_batch(self):
+        r, _ = self._batch(self._creates(5), backend="journal")
+        journal = os.path.join(self.tmpdir, "tasks.journal.jsonl")
+        with open(journal) as f:
+            self.assertEqual(len(f.readlines()), 5)
+        r, _ = self._batch(self._creates(5))
+        with open(self.tasks_file) as f:
+            self.assertEqual(len(json.load(f)), 5)
+
+    def test_bad_lines_reported_in_place(self):
+        r, results = self._batch([
+            self._creates(1)[0],
+            "not json",
+            {"op": "update", "id": "task_missing", "state": "done"},
+            {"op": "delete"},
+            {"op": "create", "project": "p"},
+        ])
+        self.assertEqual(r.returncode, 1)
+        self.assertEqual([res["status"] for res in results],
+                         ["created", "error", "error", "error", "error"])
+        self.assertEqual(results[2]["error"], "not found")
+        self.assertIn("missing field", results[4]["error"])
+        # The good operation is still applied
+        with open(self.tasks_file) as f:
+            self.assertEqual(len(json.load(f)), 1)
+
+    def test_empty_batch(self):
+        r, results = self._batch([])
+        self.assertEqual(r.returncode, 0)
+        self.assertEqual(results, [])
+        self.assertFalse(os.path.exists(self.tasks_file))
+
+
+class TestTaskTrackerStats(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="nasopenclaw_test_tt_stats_")
+        self.tasks_file = os.path.join(self.tmpdir, "tasks.json")
+        self.env = {**os.environ, "OPENCLAW_TASKS_FILE": self.tasks_file}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _run(self, *args):
+        cmd = [sys.executable, TOOL] + list(args)
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=30, env=self.env)
+
+    def _task(self, n, project, model, states):
+        # states: [(state, minute offset)] starting at 10:00
+        transitions = [{"state": st, "at": f"2026-02-22T10:{m:02d}:00Z"} for st, m in states]
+        return {"id": f"task_{n}", "project": project, "description": "d", "model": model,
+                "state": states[-1][0], "created_at": transitions[0]["at"],
+                "updated_at": transitions[-1]["at"], "commit": None, "error": None,
+                "transitions": transitions}
+
+    def _write(self, tasks):
+        with open(self.tasks_file, "w") as f:
+            json.dump(tasks, f)
+
+    def _stats(self, *args):
+        r = self._run("stats", "--format", "json", *args)
+        self.assertEqual(r.returncode, 0, r.stdout + r.stderr)
+        return json.loads(r.stdout)
+
+    # ── Transitions ─────────────────────────────────────────────────────
+
+    def test_transitions_recorded_on_state_change(self):
+        r = self._run("create", "--project", "p", "--description", "d", "--model", "m")
+        task_id = r.stdout.strip()
+        self._run("update", task_id, "--state", "running")
+        self._run("update", task_id, "--commit", "abc")
+        self._run("update", task_id, "--state", "done")
+        with open(self.tasks_file) as f:
+            t = json.load(f)[0]
+        self.assertEqual([tr["state"] for tr in t["transitions"]], ["queued", "running", "done"])
+        self.assertEqual(t["transitions"][-1]["at"], t["updated_at"])
+
+    # ── Stats ───────────────────────────────────────────────────────────
+
+    def test_time_in_state_percentiles(self):
+        self._write([
+            self._task(1, "a", "m1", [("queued", 0), ("running", 1), ("done", 11)]),
+            self._task(2, "a", "m1", [("queued", 0), ("running", 3), ("done", 23)]),
+            self._task(3, "b", "m2", [("queued", 0), ("running", 2), ("testing", 32), ("failed", 35)]),
+        ])
+        stats = self._stats()
+        queued = stats["overall"]["time_in_state"]["queued"]
+        self.assertEqual(queued["n"], 3)
+        self.assertEqual(queued["p50"], 120.0)
+        self.assertEqual(queued["p99"], 180.0)
+        self.assertEqual(stats["by_model"]["m2"]["time_in_state"]["running"]["p50"], 1800.0)
+        self.assertEqual(stats["by_project"]["a"]["time_in_state"]["running"]["p95"], 1200.0)
+
+    def test_failure_rate_and_throughput(self):
+        self._write([
+            self._task(1, "a", "m1", [("queued", 0), ("done", 30)]),
+            self._task(2, "a", "m1", [("queued", 0), ("failed", 30)]),
+            self._task(3, "a", "m2", [("queued", 0), ("done", 15)]),
+            self._task(4, "a", "m2", [("queued", 0), ("running", 5)]),
+        ])
+        stats = self._stats()
+        self.assertAlmostEqual(stats["overall"]["failure_rate"], 1 / 3)
+        # 3 finished tasks between 10:00 and 10:30
+        self.assertAlmostEqual(stats["overall"]["tasks_per_hour"], 6.0)
+        self.assertEqual(stats["by_model"]["m2"]["failure_rate"], 0.0)
+        self.assertEqual(stats["overall"]["tasks"], 4)
+
+    def test_filter_by_model(self):
+        self._write([
+            self._task(1, "a", "m1", [("queued", 0), ("done", 30)]),
+            self._task(2, "a", "m2", [("queued", 0), ("failed", 30)]),
+        ])
+        stats = self._stats("--model", "m2")
+        self.assertEqual(list(stats["by_model"]), ["m2"])
+        self.assertEqual(stats["overall"]["failure_rate"], 1.0)
+
+    def test_legacy_tasks_without_transitions(self):
+        self._write([{"id": "task_old", "project": "a", "description": "d", "model": "m",
+                      "state": "done", "created_at": "2026-01-01T00:00:00Z",
+                      "updated_at": "2026-01-01T01:00:00Z", "commit": None, "error": None}])
+        stats = self._stats()
+        self.assertEqual(stats["overall"]["done"], 1)
+        self.assertEqual(stats["overall"]["time_in_state"], {})
+
+    def test_table_output(self):
+        self._write([self._task(1, "a", "m1", [("queued", 0), ("running", 1), ("done", 11)])])
+        r = self._run("stats")
+        self.assertEqual(r.returncode, 0, r.stderr)
+        self.assertIn("failure rate", r.stdout)
+        self.assertIn("running", r.stdout)
+        self.assertIn("m1", r.stdout)
+
+
+class TestTaskTrackerListPaging(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # One populated store per backend, shared by the read-only tests below
+        cls.tmpdir = tempfile.mkdtemp(prefix="nasopenclaw_test_tt_page_")
+        cls.envs = {}
+        for backend in ("json", "sqlite"):
+            tasks_file = os.path.join(cls.tmpdir, backend, "tasks.json")
+            os.makedirs(os.path.dirname(tasks_file))
+            cls.envs[backend] = {**os.environ, "OPENCLAW_TASKS_FILE": tasks_file,
+                                 "OPENCLAW_TASKS_BACKEND": backend}
+            for i in range(12):
+                cls._cli(backend, "create", "--project", f"p{i}", "--description", "d", "--model", "m")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    @classmethod
+    def _cli(cls, backend, *args):
+        cmd = [sys.executable, TOOL] + list(args)
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=30, env=cls.envs[backend])
+
+    def _projects(self, backend, *args):
+        r = self._cli(backend, "list", "--format", "jsonl", *args)
+        self.assertEqual(r.returncode, 0, r.stdout + r.stderr)
+        return [json.loads(l)["project"] for l in r.stdout.splitlines()]
+
+    def test_limit_and_offset(self):
+        for backend in self.envs:
+            with self.subTest(backend=backend):
+                self.assertEqual(self._projects(backend, "--limit", "3"), ["p11", "p10", "p9"])
+                self.assertEqual(self._projects(backend, "--limit", "2", "--offset", "3"), ["p8", "p7"])
+
+    def test_limit_zero_lists_everything(self):
+        for backend in self.envs:
+            with self.subTest(backend=backend):
+                self.assertEqual(len(self._projects(backend, "--limit", "0")), 12)
+
+    def test_negative_limit_or_offset_rejected(self):
+        for flag in ("--limit", "--offset"):
+            r = self._cli("json", "list", flag, "-1")
+            self.assertEqual(r.returncode, 2)
+            self.assertIn("must not be negative", r.stderr)
+            self.assertNotIn("Traceback", r.stderr)
+
+    def test_cursor_pages_cover_history_once(self):
+        for backend in self.envs:
+            with self.subTest(backend=backend):
+                seen, cursor = [], None
+                while True:
+                    args = ["--limit", "5"] + (["--cursor", cursor] if cursor else [])
+                    r = self._cli(backend, "list", "--format", "jsonl", *args)
+                    page = [json.loads(l) for l in r.stdout.splitlines()]
+                    if not page:
+                        break
+                    seen.extend(t["project"] for t in page)
+                    cursor = page[-1]["id"]
+                self.assertEqual(seen, [f"p{i}" for i in range(11, -1, -1)])
+
+    def test_cursor_survives_task_leaving_the_filter(self):
+        for backend in ("json", "sqlite", "journal"):
+            with self.subTest(backend=backend):
+                tasks_file = os.path.join(self.tmpdir, "cursor-" + backend, "tasks.json")
+                os.makedirs(os.path.dirname(tasks_file))
+                env = {**os.environ, "OPENCLAW_TASKS_FILE": tasks_file, "OPENCLAW_TASKS_BACKEND": backend}
+
+                def cli(*args):
+                    return subprocess.run([sys.executable, TOOL] + list(args), capture_output=True,
+                                          text=True, timeout=30, env=env).stdout
+
+                ids = [cli("create", "--project", f"f{i}", "--description", "d", "--model", "m").strip()
+                       for i in range(4)]
+                for task_id in ids:
+                    cli("update", task_id, "--state", "failed")
+                page = [json.loads(l) for l in cli("list", "--state", "failed", "--limit", "2",
+                                                   "--format", "jsonl").splitlines()]
+                cli("update", page[-1]["id"], "--state", "running")
+                rest = [json.loads(l)["project"] for l in cli(
+                    "list", "--state", "failed", "--limit", "2", "--cursor", page[-1]["id"],
+                    "--format", "jsonl").splitlines()]
+                self.assertEqual(rest, ["f1", "f0"])
+
+    def test_table_prints_next_cursor_when_page_full(self):
+        r = self._cli("json", "list", "--limit", "2")
+        lines = [l for l in r.stdout.splitlines() if l.startswith("task_")]
+        self.assertIn(f"--cursor {lines[-1].split()[0]}", r.stdout)
+
+    def test_json_format_is_one_array(self):
+        for backend in self.envs:
+            with self.subTest(backend=backend):
+                r = self._cli(backend, "list", "--format", "json", "--limit", "4")
+                data = json.loads(r.stdout)
+                self.assertEqual([t["project"] for t in data], ["p11", "p10", "p9", "p8"])
+
+    def test_json_format_empty(self):
+        r = self._cli("json", "list", "--format", "json", "--project", "nope")
+        self.assertEqual(json.loads(r.stdout), [])
+
+    def test_time_window(self):
+        for backend in self.envs:
+            with self.subTest(backend=backend):
+                self.assertEqual(self._projects(backend, "--since", "2999-01-01"), [])
+                self.assertEqual(self._projects(backend, "--until", "2000-01-01"), [])
+                self.assertEqual(len(self._projects(backend, "--since", "2000-01-01", "--limit", "0")), 12)
+
+
+class TestTaskTrackerRetention(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="nasopenclaw_test_tt_ret_")
+        self.tasks_file = os.path.join(self.tmpdir, "tasks.json")
+        self.archive_dir = os.path.join(self.tmpdir, "archive")
+        self.env = {**os.environ, "OPENCLAW_TASKS_FILE": self.tasks_file,
+                    "OPENCLAW_TASKS_RETAIN": "3"}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _run(self, *args, env=None):
+        cmd = [sys.executable, TOOL] + list(args)
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=30,
+                              env={**self.env, **(env or {})})
+
+    def _create(self, project="proj", env=None):
+        r = self._run("create", "--project", project, "--description", "d", "--model", "m", env=env)
+        return r.stdout.strip()
+
+    def _archived(self):
+        tasks = []
+        for name in sorted(os.listdir(self.archive_dir)):
+            with gzip.open(os.path.join(self.archive_dir, name), "rt") as f:
+                tasks.extend(json.loads(l) for l in f)
+        return tasks
+
+    # ── Roll-over ───────────────────────────────────────────────────────
+
+    def test_overflow_rolls_into_monthly_segment(self):
+        for i in range(5):
+            self._create(project=f"p{i}")
+        with open(self.tasks_file) as f:
+            self.assertEqual([t["project"] for t in json.load(f)], ["p2", "p3", "p4"])
+        self.assertEqual([t["project"] for t in self._archived()], ["p0", "p1"])
+        for name in os.listdir(self.archive_dir):
+            self.assertRegex(name, r"^tasks-\d{4}-\d{2}\.jsonl\.gz$")
+
+    def test_sqlite_overflow_archived(self):
+        env = {"OPENCLAW_TASKS_BACKEND": "sqlite"}
+        for i in range(4):
+            self._create(project=f"p{i}", env=env)
+        self.assertEqual([t["project"] for t in self._archived()], ["p0"])
+
+    def test_journal_overflow_archived_on_compaction(self):
+        env = {"OPENCLAW_TASKS_BACKEND": "journal"}
+        for i in range(4):
+            self._create(project=f"p{i}", env=env)
+        self.assertFalse(os.path.exists(self.archive_dir))
+        self._run("compact", env=env)
+        self.assertEqual([t["project"] for t in self._archived()], ["p0"])
+
+    def test_journal_overflow_readable_before_compaction(self):
+        env = {"OPENCLAW_TASKS_BACKEND": "journal"}
+        ids = [self._create(project=f"p{i}", env=env) for i in range(5)]
+        r = self._run("show", ids[0], env=env)
+        self.assertEqual(r.returncode, 0, r.stdout)
+        listed = self._run("list", "--format", "jsonl", env=env).stdout.splitlines()
+        self.assertEqual(len(listed), 5)
+        self._run("compact", env=env)
+        self.assertEqual([t["project"] for t in self._archived()], ["p0", "p1"])
+        r = self._run("list", "--archived", env=env)
+        self.assertIn(ids[0], r.stdout)
+
+    def test_torn_archive_member_skipped(self):
+        for i in range(5):
+            self._create(project=f"p{i}")
+        [name] = os.listdir(self.archive_dir)
+        path = os.path.join(self.archive_dir, name)
+        # A crash mid-append leaves half a member; later appends follow it
+        with open(path, "ab") as f:
+            f.write(gzip.compress(b'{"id": "torn"}\n')[:12])
+        for i in range(5, 7):
+            self._create(project=f"p{i}")
+        r = self._run("list", "--archived", "--format", "jsonl")
+        self.assertEqual([json.loads(l)["project"] for l in r.stdout.splitlines()],
+                         ["p0", "p1", "p2", "p3"])
+
+    # ── list --archived ─────────────────────────────────────────────────
+
+    def test_list_archived_oldest_first(self):
+        for i in range(5):
+            self._create(project=f"p{i}")
+        r = self._run("list", "--archived")
+        self.assertEqual(r.returncode, 0)
+        self.assertLess(r.stdout.find("p0"), r.stdout.find("p1"))
+        self.assertNotIn("p4", r.stdout)
+
+    def test_list_archived_since_skips_older(self):
+        for i in range(5):
+            self._create(project=f"p{i}")
+        r = self._run("list", "--archived", "--since", "2999-01-01")
+        self.assertNotIn("p0", r.stdout)
+        r = self._run("list", "--archived", "--since", "2000-01")
+        self.assertIn("p0", r.stdout)
+
+    def test_list_archived_without_archive(self):
+        r = self._run("list", "--archived")
+        self.assertEqual(r.returncode, 0)
+        self.assertIn("ID", r.stdout)
+
+
+@unittest.skipIf(fcntl is None, "fcntl locking is Linux-only")
+class TestTaskTrackerLocking(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="nasopenclaw_test_tt_lock_")
+        self.tasks_file = os.path.join(self.tmpdir, "tasks.json")
+        self.lock_file = os.path.join(self.tmpdir, ".tasks.lock")
+        self.env = {**os.environ, "OPENCLAW_TASKS_FILE": self.tasks_file,
+                    "OPENCLAW_TASKS_LOCK_TIMEOUT": "0.3"}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _run(self, *args):
+        cmd = [sys.executable, TOOL] + list(args)
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=30, env=self.env)
+
+    def _hold_lock(self, mode):
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT)
+        self.addCleanup(os.close, fd)
+        fcntl.flock(fd, mode)
+
+    def test_write_times_out_while_locked(self):
+        self._hold_lock(fcntl.LOCK_EX)
+        r = self._run("create", "--project", "p", "--description", "d", "--model", "m")
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("timed out", r.stdout)
+        self.assertFalse(os.path.exists(self.tasks_file))
+
+    def test_read_allowed_under_shared_lock(self):
+        self._hold_lock(fcntl.LOCK_SH)
+        r = self._run("list")
+        self.assertEqual(r.returncode, 0)
+
+    def test_write_refuses_to_clobber_corrupt_file(self):
+        with open(self.tasks_file, "w") as f:
+            f.write("not json!!!")
+        r = self._run("create", "--project", "p", "--description", "d", "--model", "m")
+        self.assertEqual(r.returncode, 1)
+        with open(self.tasks_file) as f:
+            self.assertEqual(f.read(), "not json!!!")
+
+    def test_atomic_save_leaves_no_temp_files(self):
+        self._run("create", "--project", "p", "--description", "d", "--model", "m")
+        leftovers = [n for n in os.listdir(self.tmpdir) if n.endswith(".tmp")]
+        self.assertEqual(leftovers, [])
+
+    def test_save_keeps_file_mode(self):
+        self._run("create", "--project", "p", "--description", "d", "--model", "m")
+        umask = os.umask(0)
+        os.umask(umask)
+        for name in ("tasks.json", ".tasks.seq"):
+            self.assertEqual(os.stat(os.path.join(self.tmpdir, name)).st_mode & 0o777,
+                             0o666 & ~umask, name)
+        os.chmod(self.tasks_file, 0o664)
+        self._run("create", "--project", "p", "--description", "d", "--model", "m")
+        self.assertEqual(os.stat(self.tasks_file).st_mode & 0o777, 0o664)
+
+    def test_parallel_writers_lose_nothing(self):
+        for backend in ("json", "journal"):
+            with self.subTest(backend=backend):
+                workdir = tempfile.mkdtemp(dir=self.tmpdir)
+                result = run_stress(writers=4, tasks=5, backend=backend, tmpdir=workdir)
+                self.assertEqual(result["lost_updates"], 0)
+                self.assertEqual(result["lost_creates"], 0)
+                self.assertEqual(result["duplicate_ids"], 0)
+
+
+class TestTaskTrackerSqlite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="nasopenclaw_test_tt_sql_")
+        self.tasks_file = os.path.join(self.tmpdir, "tasks.json")
+        self.db_file = os.path.join(self.tmpdir, "tasks.db")
+        self.env = {**os.environ, "OPENCLAW_TASKS_FILE": self.tasks_file,
+                    "OPENCLAW_TASKS_BACKEND": "sqlite"}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _run(self, *args):
+        cmd = [sys.executable, TOOL] + list(args)
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=30, env=self.env)
+
+    def _create(self, project="proj", desc="do thing", model="test/model"):
+        r = self._run("create", "--project", project, "--description", desc, "--model", model)
+        return r.stdout.strip()
+
+    def _db(self):
+        conn = sqlite3.connect(self.db_file)
+        self.addCleanup(conn.close)
+        return conn
+
+    # ── Storage ─────────────────────────────────────────────────────────
+
+    def test_creates_db_not_json(self):
+        self._create()
+        self.assertTrue(os.path.exists(self.db_file))
+        self.assertFalse(os.path.exists(self.tasks_file))
+
+    def test_db_uses_wal_mode(self):
+        self._create()
+        mode = self._db().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_indexes_exist(self):
+        self._create()
+        names = {r[0] for r in self._db().execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tasks'")}
+        self.assertIn("idx_tasks_project_state", names)
+        self.assertIn("idx_tasks_state", names)
+        self.assertIn("idx_tasks_updated_at", names)
+
+    def test_filtered_list_uses_index(self):
+        self._create()
+        plan = " ".join(str(r) for r in self._db().execute(
+            "EXPLAIN QUERY PLAN SELECT data FROM tasks WHERE project = ? AND state = ? "
+            "ORDER BY seq DESC", ("p", "failed")))
+        self.assertIn("idx_tasks_project_state", plan)
+
+    # ── CLI round trip ──────────────────────────────────────────────────
+
+    def test_update_and_show(self):
+        task_id = self._create()
+        self._run("update", task_id, "--state", "failed", "--error", "boom")
+        r = self._run("show", task_id)
+        data = json.loads(r.stdout)
+        self.assertEqual(data["state"], "failed")
+        self.assertEqual(data["error"], "boom")
+        self.assertEqual(data["project"], "proj")
+
+    def test_update_nonexistent_exits_1(self):
+        r = self._run("update", "task_fake_id", "--state", "done")
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("not found", r.stdout.lower())
+
+    def test_ids_count_up_in_db(self):
+        ids = [self._create() for _ in range(3)]
+        self.assertEqual([i[-3:] for i in ids], ["001", "002", "003"])
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, ".tasks.seq")))
+
+    def test_list_filters_by_project_and_state(self):
+        id1 = self._create(project="alpha")
+        self._create(project="alpha")
+        self._create(project="beta")
+        self._run("update", id1, "--state", "failed")
+        r = self._run("list", "--project", "alpha", "--state", "failed")
+        lines = [l for l in r.stdout.split("\n") if l.startswith("task_")]
+        self.assertEqual(len(lines), 1)
+        self.assertIn(id1, lines[0])
+
+    # ── Import ──────────────────────────────────────────────────────────
+
+    def test_import_json_carries_history(self):
+        history = [
+            {"id": f"task_old_{i}", "project": "legacy", "description": "d", "model": "m",
+             "state": "done", "created_at": "2026-01-01T00:00:00Z",
+             "updated_at": "2026-01-01T00:00:00Z", "commit": None, "error": None}
+            for i in range(3)
+        ]
+        with open(self.tasks_file, "w") as f:
+            json.dump(history, f)
+        r = self._run("import-json")
+        self.assertEqual(r.returncode, 0, r.stdout + r.stderr)
+        self.assertIn("Imported 3", r.stdout)
+        r = self._run("list", "--project", "legacy")
+        # Newest first, in the order they were stored in tasks.json
+        ids = [l.split()[0] for l in r.stdout.split("\n") if l.startswith("task_")]
+        self.assertEqual(ids, ["task_old_2", "task_old_1", "task_old_0"])
+
+    def test_import_missing_file_exits_1(self):
+        r = self._run("import-json", "--file", os.path.join(self.tmpdir, "nope.json"))
+        self.assertEqual(r.returncode, 1)
+
+
+class TestTaskTrackerJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="nasopenclaw_test_tt_jrn_")
+        self.tasks_file = os.path.join(self.tmpdir, "tasks.json")
+        self.journal_file = os.path.join(self.tmpdir, "tasks.journal.jsonl")
+        self.env = {**os.environ, "OPENCLAW_TASKS_FILE": self.tasks_file,
+                    "OPENCLAW_TASKS_BACKEND": "journal"}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _run(self, *args, env=None):
+        cmd = [sys.executable, TOOL] + list(args)
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=30,
+                              env={**self.env, **(env or {})})
+
+    def _create(self, project="proj", env=None):
+        r = self._run("create", "--project", project, "--description", "d", "--model", "m", env=env)
+        return r.stdout.strip()
+
+    def _journal_lines(self):
+        with open(self.journal_file) as f:
+            return [json.loads(l) for l in f if l.strip()]
+
+    # ── Appends ─────────────────────────────────────────────────────────
+
+    def test_create_appends_one_compact_line(self):
+        self._create()
+        self._create()
+        events = self._journal_lines()
+        self.assertEqual([e["op"] for e in events], ["create", "create"])
+        with open(self.journal_file) as f:
+            self.assertNotIn(": ", f.readline())
+        self.assertFalse(os.path.exists(self.tasks_file))
+
+    def test_update_appends_only_changes(self):
+        task_id = self._create()
+        self._run("update", task_id, "--state", "running")
+        event = self._journal_lines()[-1]
+        self.assertEqual(event["op"], "update")
+        self.assertEqual(event["id"], task_id)
+        self.assertEqual(event["changes"]["state"], "running")
+        self.assertNotIn("description", event["changes"])
+
+    def test_show_replays_journal(self):
+        task_id = self._create()
+        self._run("update", task_id, "--state", "failed", "--error", "boom")
+        data = json.loads(self._run("show", task_id).stdout)
+        self.assertEqual(data["state"], "failed")
+        self.assertEqual(data["error"], "boom")
+
+    def test_update_nonexistent_exits_1(self):
+        r = self._run("update", "task_fake_id", "--state", "done")
+        self.assertEqual(r.returncode, 1)
+
+    def test_torn_trailing_line_ignored(self):
+        task_id = self._create()
+        with open(self.journal_file, "a") as f:
+            f.write('{"op":"update","id":')
+        r = self._run("show", task_id)
+        self.assertEqual(r.returncode, 0)
+        self.assertEqual(json.loads(r.stdout)["id"], task_id)
+
+    # ── Compaction ──────────────────────────────────────────────────────
+
+    def test_compaction_folds_journal_into_snapshot(self):
+        task_id = self._create(env={"OPENCLAW_TASKS_COMPACT_BYTES": "1"})
+        self.assertEqual(self._journal_lines(), [])
+        with open(self.tasks_file) as f:
+            self.assertEqual(json.load(f)[0]["id"], task_id)
+
+    def test_replay_tail_after_snapshot(self):
+        first = self._create()
+        self._run("compact")
+        second = self._create()
+        self.assertEqual(len(self._journal_lines()), 1)
+        r = self._run("list")
+        self.assertIn(first, r.stdout)
+        self.assertIn(second, r.stdout)
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "serve needs Unix domain sockets")
+class TestTaskTrackerDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="nasopenclaw_test_tt_srv_")
+        self.tasks_file = os.path.join(self.tmpdir, "tasks.json")
+        self.socket_path = os.path.join(self.tmpdir, ".tasks.sock")
+        self.env = {**os.environ, "OPENCLAW_TASKS_FILE": self.tasks_file}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _run(self, *args, env=None):
+        cmd = [sys.executable, TOOL] + list(args)
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=30, env=env or self.env)
+
+    def _serve(self, env=None):
+        proc = subprocess.Popen([sys.executable, TOOL, "serve"], env={**self.env, **(env or {})},
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        self.addCleanup(proc.wait, 10)
+        self.addCleanup(proc.terminate)
+        self.assertIn("Serving", proc.stdout.readline())
+        return proc
+
+    def _client_env(self):
+        # A client whose own tasks file is elsewhere: anything it sees must
+        # have come through the daemon
+        elsewhere = os.path.join(self.tmpdir, "client", "tasks.json")
+        os.makedirs(os.path.dirname(elsewhere), exist_ok=True)
+        return {**os.environ, "OPENCLAW_TASKS_FILE": elsewhere,
+                "OPENCLAW_TASKS_SOCKET": self.socket_path}
+
+    def _request(self, payload):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            sock.sendall(payload.encode() + b"\n")
+            with sock.makefile("r") as f:
+                return json.loads(f.readline())
+
+    # ── Client through daemon ───────────────────────────────────────────
+
+    def test_cli_goes_through_daemon(self):
+        self._serve()
+        client = self._client_env()
+        task_id = self._run("create", "--project", "p", "--description", "d", "--model", "m",
+                            env=client).stdout.strip()
+        r = self._run("update", task_id, "--state", "running", env=client)
+        self.assertEqual(r.returncode, 0, r.stdout)
+        with open(self.tasks_file) as f:
+            stored = json.load(f)
+        self.assertEqual(stored[0]["id"], task_id)
+        self.assertEqual(stored[0]["state"], "running")
+        shown = json.loads(self._run("show", task_id, env=client).stdout)
+        self.assertEqual(shown["state"], "running")
+        self.assertIn(task_id, self._run("list", env=client).stdout)
+
+    def test_daemon_not_found_exits_1(self):
+        self._serve()
+        r = self._run("update", "task_missing", "--state", "done", env=self._client_env())
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("not found", r.stdout.lower())
+
+    def test_daemon_sees_direct_writes(self):
+        self._serve()
+        # Written straight to the file, bypassing the socket
+        env = {**self.env, "OPENCLAW_TASKS_SOCKET": os.path.join(self.tmpdir, "none.sock")}
+        task_id = self._run("create", "--project", "p", "--description", "d", "--model", "m",
+                            env=env).stdout.strip()
+        response = self._request(json.dumps({"op": "show", "args": {"task_id": task_id}}))
+        self.assertTrue(response["ok"])
+        self.assertEqual(response["result"]["id"], task_id)
+
+    def test_batch_through_daemon(self):
+        self._serve()
+        ops = [{"op": "create", "project": f"p{i}", "description": "d", "model": "m"} for i in range(3)]
+        r = subprocess.run([sys.executable, TOOL, "batch"], capture_output=True, text=True, timeout=30,
+                           input="".join(json.dumps(op) + "\n" for op in ops), env=self._client_env())
+        self.assertEqual(r.returncode, 0, r.stdout + r.stderr)
+        with open(self.tasks_file) as f:
+            self.assertEqual(len(json.load(f)), 3)
+        # The daemon's cache picks up the batch
+        self.assertEqual(len(self._run("list", "--format", "jsonl", env=self._client_env()).stdout.splitlines()), 3)
+
+    @unittest.skipIf(fcntl is None, "fcntl locking is Linux-only")
+    def test_daemon_write_racing_direct_write_keeps_both(self):
+        self._serve()
+        client = self._client_env()
+        self._run("create", "--project", "first", "--description", "d", "--model", "m", env=client)
+        # Warm the daemon's cache, then make its next create wait on the lock
+        # while a direct writer changes the file underneath it
+        self._run("list", env=client)
+        fd = os.open(os.path.join(self.tmpdir, ".tasks.lock"), os.O_RDWR | os.O_CREAT)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        create = subprocess.Popen([sys.executable, TOOL, "create", "--project", "daemon",
+                                   "--description", "d", "--model", "m"],
+                                  stdout=subprocess.PIPE, text=True, env=client)
+        try:
+            time.sleep(0.5)
+            with open(self.tasks_file) as f:
+                tasks = json.load(f)
+            tasks.append({**tasks[0], "id": "task_direct", "project": "direct"})
+            with open(self.tasks_file, "w") as f:
+                json.dump(tasks, f)
+        finally:
+            os.close(fd)
+        create.communicate(timeout=30)
+        listed = self._run("list", "--format", "jsonl", env=client).stdout
+        self.assertEqual(sorted(json.loads(l)["project"] for l in listed.splitlines()),
+                         ["daemon", "direct", "first"])
+
+    def test_journal_compaction_behind_daemon_drops_archived(self):
+        env = {"OPENCLAW_TASKS_BACKEND": "journal", "OPENCLAW_TASKS_RETAIN": "3",
+               "OPENCLAW_TASKS_COMPACT_BYTES": "1"}
+        self._serve(env=env)
+        client = self._client_env()
+        ids = [self._run("create", "--project", f"p{i}", "--description", "d", "--model", "m",
+                         env=client).stdout.strip() for i in range(6)]
+        listed = self._run("list", "--limit", "0", "--format", "jsonl", env=client).stdout
+        self.assertEqual(len(listed.splitlines()), 3)
+        self.assertEqual(self._run("show", ids[0], env=client).returncode, 1)
+
+    def test_unknown_op_reports_error(self):
+        self._serve()
+        response = self._request(json.dumps({"op": "drop"}))
+        self.assertFalse(response["ok"])
+        self.assertIn("unknown op", response["error"])
+
+    def test_sqlite_backend_behind_daemon(self):
+        self._serve(env={"OPENCLAW_TASKS_BACKEND": "sqlite"})
+        client = self._client_env()
+        task_id = self._run("create", "--project", "p", "--description", "d", "--model", "m",
+                            env=client).stdout.strip()
+        self.assertEqual(self._run("update", task_id, "--state", "done", env=client).returncode, 0)
+        self.assertEqual(json.loads(self._run("show", task_id, env=client).stdout)["state"], "done")
+
+    # ── Lifecycle ───────────────────────────────────────────────────────
+
+    def test_socket_removed_on_terminate(self):
+        proc = self._serve()
+        self.assertTrue(os.path.exists(self.socket_path))
+        proc.terminate()
+        proc.wait(10)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_stale_socket_falls_back_to_files(self):
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.socket_path)
+        stale.close()
+        r = self._run("create", "--project", "p", "--description", "d", "--model", "m")
+        self.assertEqual(r.returncode, 0, r.stdout)
+        self.assertTrue(os.path.exists(self.tasks_file))
+
+    def _broken_daemon(self, answer):
+        # Accepts one request and then either hangs up or never replies
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        listener.listen(1)
+        self.addCleanup(listener.close)
+
+        def accept():
+            conn, _ = listener.accept()
+            conn.recv(4096)
+            if answer is None:
+                conn.close()
+            else:
+                self.addCleanup(conn.close)
+        threading.Thread(target=accept, daemon=True).start()
+
+    def test_daemon_hanging_up_is_an_error(self):
+        self._broken_daemon(answer=None)
+        r = self._run("create", "--project", "p", "--description", "d", "--model", "m")
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("connection closed", r.stdout)
+        self.assertNotIn("Traceback", r.stderr)
+        # Not retried against the files: the daemon may have applied it
+        self.assertFalse(os.path.exists(self.tasks_file))
+
+    def test_daemon_not_answering_times_out(self):
+        self._broken_daemon(answer="never")
+        env = {**self.env, "OPENCLAW_TASKS_LOCK_TIMEOUT": "0"}
+        r = self._run("show", "task_x", env=env)
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("timed out", r.stdout)
+        self.assertNotIn("Traceback", r.stderr)
+
+    def test_second_daemon_refuses_to_start(self):
+        self._serve()
+        r = self._run("serve")
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("already listening", r.stdout)
+
+
 if __name__ == "__main__":
     unittest.main()
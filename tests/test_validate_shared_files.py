@@ -5,7 +5,9 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import time
 import unittest
+import zlib
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TOOL = os.path.join(PROJECT_ROOT, "tools", "validate_shared_files.py")
@@ -19,10 +21,11 @@ class TestValidateSharedFiles(unittest.TestCase):
     def tearDown(self):
         shutil.rmtree(self.tmpdir, ignore_errors=True)
 
-    def _run(self, mode, project_path=None):
+    def _run(self, mode, project_path=None, *extra):
         args = [sys.executable, TOOL, mode]
         if project_path:
             args.append(project_path)
+        args.extend(extra)
         return subprocess.run(args, capture_output=True, text=True, timeout=30)
 
     def _write(self, relpath, content="default content"):
@@ -179,6 +182,458 @@ class TestValidateSharedFiles(unittest.TestCase):
         self.assertEqual(r.returncode, 1)
         self.assertIn("Snapshot file", r.stdout)
 
+    # ── Stat cache ──────────────────────────────────────────────────────
+
+    def _cache_path(self):
+        return os.path.join(self.tmpdir, ".openclaw_snapshot.cache.json")
+
+    def _plant_cache(self, relpath, fake_hash):
+        """Backdate relpath and record a bogus hash for its current stat."""
+        full = os.path.join(self.tmpdir, relpath)
+        old = os.stat(full).st_mtime_ns - 3600 * 10**9
+        os.utime(full, ns=(old, old))
+        st = os.stat(full)
+        with open(self._cache_path()) as f:
+            cache = json.load(f)
+        cache["files"][relpath] = [st.st_size, st.st_mtime_ns, st.st_ino, fake_hash]
+        with open(self._cache_path(), "w") as f:
+            json.dump(cache, f)
+
+    def test_snapshot_writes_stat_cache_and_ignores_it(self):
+        self._write("astro.config.mjs", "original")
+        self._run("snapshot", self.tmpdir)
+        with open(self._cache_path()) as f:
+            cache = json.load(f)
+        self.assertEqual(cache["files"]["astro.config.mjs"][3], self._sha256("original"))
+        with open(os.path.join(self.tmpdir, ".gitignore")) as f:
+            self.assertIn(".openclaw_snapshot.cache.json", f.read().splitlines())
+
+    def test_check_trusts_unchanged_stat(self):
+        self._write("astro.config.mjs", "original")
+        self._run("snapshot", self.tmpdir)
+        self._plant_cache("astro.config.mjs", "0" * 64)
+        r = self._run("check", self.tmpdir)
+        # The planted hash is used without reading the file
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("astro.config.mjs", r.stdout)
+
+    def test_check_paranoid_rehashes_everything(self):
+        self._write("astro.config.mjs", "original")
+        self._run("snapshot", self.tmpdir)
+        self._plant_cache("astro.config.mjs", "0" * 64)
+        r = self._run("check", self.tmpdir, "--paranoid")
+        self.assertEqual(r.returncode, 0)
+        self.assertIn("All protected files unchanged", r.stdout)
+
+    def test_check_rehashes_recently_modified_file(self):
+        self._write("astro.config.mjs", "original")
+        self._run("snapshot", self.tmpdir)
+        st = os.stat(os.path.join(self.tmpdir, "astro.config.mjs"))
+        with open(self._cache_path()) as f:
+            cache = json.load(f)
+        # Matching stat, but mtime is inside the racy window of the cache write
+        cache["files"]["astro.config.mjs"] = [st.st_size, st.st_mtime_ns, st.st_ino, "0" * 64]
+        with open(self._cache_path(), "w") as f:
+            json.dump(cache, f)
+        r = self._run("check", self.tmpdir)
+        self.assertEqual(r.returncode, 0)
+
+    def test_corrupt_stat_cache_is_ignored(self):
+        self._write("astro.config.mjs", "original")
+        self._run("snapshot", self.tmpdir)
+        with open(self._cache_path(), "w") as f:
+            f.write("{not json")
+        r = self._run("check", self.tmpdir)
+        self.assertEqual(r.returncode, 0)
+
+    # ── Parallel hashing ────────────────────────────────────────────────
+
+    def test_serial_and_parallel_snapshots_match(self):
+        for i in range(40):
+            self._write(f"src/lib/d{i % 5}/f{i}.ts", f"content {i}")
+        self._write("astro.config.mjs", b"\x00" * (3 << 20))  # chunked path
+        self._run("snapshot", self.tmpdir, "--workers", "1", "--paranoid")
+        serial = self._read_snapshot()
+        self._run("snapshot", self.tmpdir, "--workers", "8", "--paranoid")
+        self.assertEqual(self._read_snapshot(), serial)
+        self.assertEqual(len(serial), 41)
+        self.assertEqual(serial["astro.config.mjs"], self._sha256(b"\x00" * (3 << 20)))
+
+    def test_large_file_hashed_via_mmap(self):
+        payload = os.urandom(1 << 16) * 80  # 5 MiB, above the mmap threshold
+        self._write("src/pages/hero.bin", payload)
+        self._run("snapshot", self.tmpdir, "--paranoid")
+        self.assertEqual(self._read_snapshot()["src/pages/hero.bin"], self._sha256(payload))
+
+    def test_symlinked_directory_not_followed(self):
+        self._write("outside/secret.ts", "x")
+        os.makedirs(os.path.join(self.tmpdir, "src/lib"))
+        try:
+            os.symlink(os.path.join(self.tmpdir, "outside"),
+                       os.path.join(self.tmpdir, "src/lib/link"))
+        except (OSError, NotImplementedError):
+            self.skipTest("symlinks unavailable")
+        self._run("snapshot", self.tmpdir)
+        self.assertEqual(self._read_snapshot(), {})
+
+    # ── Blob store ──────────────────────────────────────────────────────
+
+    def _blobs(self):
+        root = os.path.join(self.tmpdir, ".openclaw_blobs")
+        return sorted(p + n for p in os.listdir(root) for n in os.listdir(os.path.join(root, p)))
+
+    def test_snapshot_stores_deduplicated_compressed_blobs(self):
+        self._write("src/lib/a.ts", "same")
+        self._write("src/pages/b.astro", "same")
+        self._write("tsconfig.json", "{}")
+        self._run("snapshot", self.tmpdir)
+        self.assertEqual(self._blobs(), sorted({self._sha256("same"), self._sha256("{}")}))
+        h = self._sha256("same")
+        with open(os.path.join(self.tmpdir, ".openclaw_blobs", h[:2], h[2:]), "rb") as f:
+            self.assertEqual(zlib.decompress(f.read()), b"same")
+        with open(os.path.join(self.tmpdir, ".gitignore")) as f:
+            self.assertIn(".openclaw_blobs/", f.read().splitlines())
+
+    def test_snapshot_prunes_unreferenced_blobs(self):
+        self._write("tsconfig.json", "v1")
+        self._run("snapshot", self.tmpdir)
+        self._write("tsconfig.json", "v2")
+        self._run("snapshot", self.tmpdir)
+        self.assertEqual(self._blobs(), [self._sha256("v2")])
+
+    def test_check_prints_unified_diff(self):
+        self._write("src/lib/util.ts", "line one\nline two\n")
+        self._run("snapshot", self.tmpdir)
+        self._write("src/lib/util.ts", "line one\nline 2\n")
+        r = self._run("check", self.tmpdir)
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("--- a/src/lib/util.ts", r.stdout)
+        self.assertIn("-line two", r.stdout)
+        self.assertIn("+line 2", r.stdout)
+
+    def test_check_binary_diff(self):
+        self._write("src/lib/logo.bin", b"\x00\x01")
+        self._run("snapshot", self.tmpdir)
+        self._write("src/lib/logo.bin", b"\x00\x02")
+        r = self._run("check", self.tmpdir)
+        self.assertIn("Binary files", r.stdout)
+
+    def test_check_without_blob_falls_back_to_hashes(self):
+        self._write("tsconfig.json", "{}")
+        self._run("snapshot", self.tmpdir)
+        shutil.rmtree(os.path.join(self.tmpdir, ".openclaw_blobs"))
+        self._write("tsconfig.json", "{ }")
+        r = self._run("check", self.tmpdir)
+        self.assertIn("Hash mismatch", r.stdout)
+
+    # ── Merkle tree ─────────────────────────────────────────────────────
+
+    def _snapshot_root(self):
+        with open(os.path.join(self.tmpdir, ".openclaw_snapshot.tree.json")) as f:
+            return json.load(f)["root"]
+
+    def test_snapshot_writes_tree_and_prints_root(self):
+        self._write("src/lib/a.ts", "a")
+        self._write("src/pages/index.astro", "p")
+        r = self._run("snapshot", self.tmpdir)
+        with open(os.path.join(self.tmpdir, ".openclaw_snapshot.tree.json")) as f:
+            tree = json.load(f)
+        self.assertIn(f"Root hash: {tree['root']}", r.stdout)
+        self.assertEqual(tree, {"root": tree["root"]})
+
+    def test_root_mode_matches_snapshot_until_change(self):
+        self._write("src/lib/deep/a.ts", "a")
+        self._write("tsconfig.json", "{}")
+        self._run("snapshot", self.tmpdir)
+        r = self._run("root", self.tmpdir)
+        self.assertEqual(r.returncode, 0)
+        self.assertEqual(r.stdout.strip(), self._snapshot_root())
+        self._write("src/lib/deep/a.ts", "b")
+        self.assertNotEqual(self._run("root", self.tmpdir).stdout.strip(), self._snapshot_root())
+
+    def test_root_hash_independent_of_creation_order(self):
+        self._write("src/lib/b.ts", "b")
+        self._write("src/lib/a.ts", "a")
+        first = self._run("root", self.tmpdir).stdout.strip()
+        other = tempfile.mkdtemp(prefix="nasopenclaw_test_vsf_")
+        try:
+            for name in ("a", "b"):
+                path = os.path.join(other, "src", "lib", f"{name}.ts")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(name)
+            self.assertEqual(self._run("root", other).stdout.strip(), first)
+        finally:
+            shutil.rmtree(other, ignore_errors=True)
+
+    def test_check_reports_every_file_in_removed_subtree(self):
+        self._write("src/lib/old/a.ts", "a")
+        self._write("src/lib/old/nested/b.ts", "b")
+        self._write("src/lib/keep.ts", "k")
+        self._run("snapshot", self.tmpdir)
+        shutil.rmtree(os.path.join(self.tmpdir, "src/lib/old"))
+        self._write("src/pages/new/c.astro", "c")
+        r = self._run("check", self.tmpdir)
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("src/lib/old/a.ts", r.stdout)
+        self.assertIn("src/lib/old/nested/b.ts", r.stdout)
+        self.assertIn("src/pages/new/c.astro", r.stdout)
+        self.assertNotIn("keep.ts", r.stdout)
+
+    # ── Git index backend ───────────────────────────────────────────────
+
+    def _git(self, *args):
+        subprocess.run(["git", "-C", self.tmpdir, "-c", "user.name=t", "-c", "user.email=t@t",
+                        "-c", "commit.gpgsign=false"] + list(args),
+                       capture_output=True, check=True, timeout=30)
+
+    def _git_repo(self):
+        if shutil.which("git") is None:
+            self.skipTest("git unavailable")
+        self._write("src/lib/a.ts", "a")
+        self._write("src/pages/index.astro", "p")
+        self._write("tsconfig.json", "{}")
+        self._write(".gitignore", "dist/\n")
+        self._git("init", "-q")
+        self._git("add", "-A")
+        self._git("commit", "-q", "-m", "init")
+
+    def test_git_snapshot_matches_walker(self):
+        self._git_repo()
+        self._write("src/lib/untracked.ts", "u")
+        self._write("src/lib/dist/out.js", "ignored but protected")
+        self._run("snapshot", self.tmpdir, "--no-git")
+        walked = self._read_snapshot()
+        self._run("snapshot", self.tmpdir)
+        self.assertEqual(self._read_snapshot(), walked)
+        self.assertIn("src/lib/dist/out.js", walked)
+
+    def test_git_check_detects_changes(self):
+        self._git_repo()
+        self._run("snapshot", self.tmpdir)
+        self.assertEqual(self._run("check", self.tmpdir).returncode, 0)
+        self._write("src/lib/a.ts", "changed")
+        self._write("src/pages/new.astro", "n")
+        os.remove(os.path.join(self.tmpdir, "tsconfig.json"))
+        r = self._run("check", self.tmpdir)
+        self.assertEqual(r.returncode, 1)
+        for name in ("src/lib/a.ts", "src/pages/new.astro", "tsconfig.json"):
+            self.assertIn(name, r.stdout)
+
+    def test_git_clean_files_reuse_recorded_hash(self):
+        self._git_repo()
+        self._run("snapshot", self.tmpdir)
+        with open(self._cache_path()) as f:
+            cache = json.load(f)
+        self.assertIn("src/lib/a.ts", cache["git"])
+        cache["git"]["src/lib/a.ts"][1] = "0" * 64
+        with open(self._cache_path(), "w") as f:
+            json.dump(cache, f)
+        # The index says the file is clean, so the planted hash is trusted
+        self.assertIn("src/lib/a.ts", self._run("check", self.tmpdir).stdout)
+        self.assertEqual(self._run("check", self.tmpdir, "--no-git").returncode, 0)
+
+    # ── Watch mode ──────────────────────────────────────────────────────
+
+    def _start_watch(self, *extra):
+        proc = subprocess.Popen([sys.executable, TOOL, "watch", self.tmpdir,
+                                 "--interval", "0.1"] + list(extra),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        self.addCleanup(self._stop_watch, proc)
+        state = os.path.join(self.tmpdir, ".openclaw_snapshot.watch.json")
+        deadline = time.monotonic() + 10
+        while not os.path.exists(state):
+            self.assertIsNone(proc.poll(), proc.stderr.read() if proc.poll() is not None else "")
+            self.assertLess(time.monotonic(), deadline, "watcher did not start")
+            time.sleep(0.05)
+        return proc
+
+    def _stop_watch(self, proc):
+        if proc.poll() is None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        proc.stdout.close()
+        proc.stderr.close()
+
+    def _watch_roundtrip(self, *extra):
+        self._write("src/lib/a.ts", "a")
+        self._write("tsconfig.json", "{}")
+        self._start_watch(*extra)
+        self.assertEqual(self._run("check", self.tmpdir).returncode, 0)
+        self._write("src/lib/a.ts", "changed")
+        self._write("src/pages/new/deep/page.astro", "p")
+        r = self._run("check", self.tmpdir)
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("src/lib/a.ts", r.stdout)
+        self.assertIn("src/pages/new/deep/page.astro", r.stdout)
+        self.assertNotIn("tsconfig.json", r.stdout)
+
+    def test_watch_inotify_records_changes(self):
+        if not sys.platform.startswith("linux"):
+            self.skipTest("inotify is Linux-only")
+        self._watch_roundtrip()
+
+    def test_watch_poll_records_changes(self):
+        self._watch_roundtrip("--poll")
+
+    def test_check_answers_from_watch_dirty_set(self):
+        self._write("src/lib/a.ts", "a")
+        self._write("tsconfig.json", "{}")
+        proc = self._start_watch()
+        snapshot = self._read_snapshot()
+        snapshot["tsconfig.json"] = "0" * 64
+        with open(self._snapshot_path(), "w") as f:
+            json.dump(snapshot, f)
+        # tsconfig.json is not dirty, so the live watcher vouches for the snapshot
+        self.assertEqual(self._run("check", self.tmpdir).returncode, 0)
+        self._stop_watch(proc)
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, ".openclaw_snapshot.watch.json")))
+        r = self._run("check", self.tmpdir)
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("tsconfig.json", r.stdout)
+
+    # ── Protection rules ────────────────────────────────────────────────
+
+    def _factory(self, protected):
+        self._write(".factory.json", json.dumps({"type": "astro-website", "protected": protected}))
+
+    def test_factory_rules_include_and_exclude(self):
+        self._factory({"include": ["src/lib/", "src/content/**/*.md", "*.config.mjs"],
+                       "exclude": ["**/node_modules/**", "src/lib/generated/"]})
+        self._write("src/lib/a.ts", "a")
+        self._write("src/lib/node_modules/pkg/index.js", "junk")
+        self._write("src/lib/generated/out.ts", "gen")
+        self._write("src/content/blog/post.md", "post")
+        self._write("src/content/blog/post.json", "meta")
+        self._write("astro.config.mjs", "cfg")
+        self._write("sub/astro.config.mjs", "not top level")
+        self._write("src/pages/index.astro", "no longer protected")
+        self._run("snapshot", self.tmpdir)
+        self.assertEqual(sorted(self._read_snapshot()),
+                         ["astro.config.mjs", "src/content/blog/post.md", "src/lib/a.ts"])
+
+    def test_factory_rules_bare_list(self):
+        self._factory(["tsconfig.json"])
+        self._write("tsconfig.json", "{}")
+        self._write("src/lib/a.ts", "a")
+        self._run("snapshot", self.tmpdir)
+        self.assertEqual(list(self._read_snapshot()), ["tsconfig.json"])
+
+    def test_factory_without_rules_uses_defaults(self):
+        self._write(".factory.json", json.dumps({"type": "astro-website"}))
+        self._write("src/pages/index.astro", "p")
+        self._run("snapshot", self.tmpdir)
+        self.assertIn("src/pages/index.astro", self._read_snapshot())
+
+    def test_factory_invalid_rules_exit_1(self):
+        self._factory({"include": "src/lib/"})
+        r = self._run("snapshot", self.tmpdir)
+        self.assertEqual(r.returncode, 1)
+        self.assertIn("Error", r.stdout)
+
+    def test_check_ignores_changes_in_excluded_dirs(self):
+        self._factory({"include": ["src/lib/"], "exclude": ["**/dist/**"]})
+        self._write("src/lib/a.ts", "a")
+        self._run("snapshot", self.tmpdir)
+        self._write("src/lib/dist/bundle.js", "built")
+        r = self._run("check", self.tmpdir)
+        self.assertEqual(r.returncode, 0)
+
+    def test_git_snapshot_matches_walker_with_symlinked_dir(self):
+        self._git_repo()
+        self._write("shared/util.ts", "u")
+        os.symlink(os.path.join(self.tmpdir, "shared"), os.path.join(self.tmpdir, "src", "lib", "shared"))
+        self._git("add", "-A")
+        self._git("commit", "-q", "-m", "link")
+        self._run("snapshot", self.tmpdir, "--no-git")
+        walked = self._read_snapshot()
+        self._run("snapshot", self.tmpdir)
+        self.assertEqual(self._read_snapshot(), walked)
+        self.assertNotIn("src/lib/shared/util.ts", walked)
+        self.assertEqual(self._run("root", self.tmpdir).stdout,
+                         self._run("root", self.tmpdir, "--no-git").stdout)
+
+    def test_git_backend_honours_rules(self):
+        self._git_repo()
+        self._factory({"include": ["src/"], "exclude": ["src/pages/**"]})
+        self._run("snapshot", self.tmpdir, "--no-git")
+        walked = self._read_snapshot()
+        self._run("snapshot", self.tmpdir)
+        self.assertEqual(self._read_snapshot(), walked)
+        self.assertEqual(sorted(walked), ["src/lib/a.ts"])
+
+    def test_git_backend_honours_bare_directory_exclude(self):
+        self._git_repo()
+        self._write("src/lib/generated/x.ts", "gen")
+        self._git("add", "-A")
+        self._git("commit", "-q", "-m", "gen")
+        self._factory({"include": ["src/lib/"], "exclude": ["src/lib/generated"]})
+        self._run("snapshot", self.tmpdir)
+        self.assertEqual(sorted(self._read_snapshot()), ["src/lib/a.ts"])
+        r = self._run("check", self.tmpdir, "--no-git")
+        self.assertEqual(r.returncode, 0, r.stdout)
+
+    # ── JSON output ─────────────────────────────────────────────────────
+
+    def _check_json(self, *extra):
+        r = self._run("check", self.tmpdir, "--format", "json", *extra)
+        return r.returncode, json.loads(r.stdout)
+
+    def test_check_json_clean(self):
+        self._write("tsconfig.json", "{}")
+        self._run("snapshot", self.tmpdir)
+        code, doc = self._check_json()
+        self.assertEqual(code, 0)
+        self.assertTrue(doc["ok"])
+        self.assertEqual((doc["changed"], doc["added"], doc["removed"], doc["diffs"]),
+                         ([], [], [], {}))
+        for key in ("scan_ms", "compare_ms", "diff_ms", "total_ms"):
+            self.assertIn(key, doc["timings"])
+        self.assertEqual(doc["timings"]["files"], 1)
+
+    def test_check_json_reports_changes_and_diffs(self):
+        self._write("src/lib/a.ts", "one\ntwo\n")
+        self._write("src/lib/gone.ts", "x")
+        self._write("src/lib/img.bin", b"\x00a")
+        self._run("snapshot", self.tmpdir)
+        self._write("src/lib/a.ts", "one\nTWO\n")
+        self._write("src/lib/img.bin", b"\x00b")
+        self._write("src/pages/new.astro", "n")
+        os.remove(os.path.join(self.tmpdir, "src/lib/gone.ts"))
+        code, doc = self._check_json()
+        self.assertEqual(code, 1)
+        self.assertFalse(doc["ok"])
+        self.assertEqual(doc["changed"], ["src/lib/a.ts", "src/lib/img.bin"])
+        self.assertEqual(doc["added"], ["src/pages/new.astro"])
+        self.assertEqual(doc["removed"], ["src/lib/gone.ts"])
+        a = doc["diffs"]["src/lib/a.ts"]
+        self.assertEqual(a["old_hash"], self._sha256("one\ntwo\n"))
+        self.assertIn("+TWO", a["diff"])
+        self.assertFalse(a["truncated"])
+        self.assertTrue(doc["diffs"]["src/lib/img.bin"]["binary"])
+
+    def test_check_json_caps_diff_lines(self):
+        self._write("src/lib/big.ts", "".join(f"line {i}\n" for i in range(100)))
+        self._run("snapshot", self.tmpdir)
+        self._write("src/lib/big.ts", "".join(f"LINE {i}\n" for i in range(100)))
+        _, doc = self._check_json("--max-diff-lines", "10")
+        d = doc["diffs"]["src/lib/big.ts"]
+        self.assertTrue(d["truncated"])
+        self.assertEqual(len(d["diff"].splitlines()), 10)
+        _, doc = self._check_json("--max-diff-lines", "0")
+        self.assertFalse(doc["diffs"]["src/lib/big.ts"]["truncated"])
+
+    def test_check_rejects_negative_max_diff_lines(self):
+        self._run("snapshot", self.tmpdir)
+        r = self._run("check", self.tmpdir, "--max-diff-lines", "-1")
+        self.assertEqual(r.returncode, 2)
+        self.assertIn("must not be negative", r.stderr)
+
+    def test_check_json_without_snapshot(self):
+        code, doc = self._check_json()
+        self.assertEqual(code, 1)
+        self.assertIn("Snapshot file", doc["error"])
+
     # ── Error handling ──────────────────────────────────────────────────
 
     def test_unknown_mode_exits_1(self):
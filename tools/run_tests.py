@@ -1,78 +1,768 @@
 import os
 import sys
+import json
+import time
+import re
+import queue
+import shlex
+import hashlib
+import statistics
+from collections import deque
+from datetime import datetime, timezone
+import signal
+import threading
 import subprocess
 import argparse
 
+import validate_shared_files as vsf
+
 SUITES = {
     "unit":        "npm run test:unit",
     "integration": "npm run test:integration",
     "build":       "npm run build",
 }
 
-def run_command(cmd, cwd, ssh_target=None):
+# A suite starts once every suite it depends on has passed; suites with no
+# path between them run concurrently.
+DEPENDS = {
+    "integration": ["build"],
+}
+ORDER = ["unit", "build", "integration"]
+
+# Suites whose runner can split itself (vitest, jest and playwright all take
+# --shard=i/N); each shard runs as its own job and results are merged
+SHARD_ARGS = {
+    "unit": " -- --shard={index}/{count}",
+}
+# Each shard would otherwise size its own worker pool to the whole machine,
+# so its runner is told to keep to an even split of the cores
+SHARD_WORKER_ARGS = {
+    "unit": " --maxWorkers={workers}",
+}
+# --shards auto: one per core, but never more than this (past a few shards the
+# per-shard startup costs more than it saves) nor more than there are test files
+AUTO_SHARDS_MAX = 4
+TEST_FILE_RULES = vsf.ProtectionRules(
+    ['**/*.test.*', '**/*.spec.*'],
+    ['**/node_modules/**', 'dist/**', 'build/**', '.astro/**', '.vercel/**', 'coverage/**'],
+)
+
+# Wall-clock limit per job (each shard gets the full limit) and how long a
+# job may go without printing anything; 0 disables either. A stopped job's
+# process group gets SIGTERM, then SIGKILL if it is still around KILL_GRACE
+# seconds later
+SUITE_TIMEOUTS = {
+    "unit":        15 * 60,
+    "build":       20 * 60,
+    "integration": 30 * 60,
+}
+IDLE_TIMEOUT = 5 * 60
+KILL_GRACE = 10.0
+WATCHDOG_TICK = 0.2
+
+# Passing results keyed on a fingerprint of the source tree and suite command
+CACHE_FILE = '.openclaw_testcache.json'
+# Everything in the project counts towards the fingerprint except dependency
+# trees, build output and test artefacts, which tests themselves rewrite
+FINGERPRINT_RULES = vsf.ProtectionRules(
+    ['**'],
+    ['**/node_modules/**', 'dist/**', 'build/**', '.astro/**', '.vercel/**',
+     'coverage/**', 'test-results/**', 'playwright-report/**', '**/.DS_Store'],
+)
+
+# SSH client command (OPENCLAW_SSH can point at a wrapper or a test stand-in)
+SSH = os.environ.get("OPENCLAW_SSH", "ssh")
+# One master connection per host is shared by every suite (and by any other
+# ssh call that uses the same ControlPath); it lingers for SSH_CONTROL_PERSIST
+SSH_CONTROL_DIR = os.environ.get(
+    "OPENCLAW_SSH_CONTROL_DIR", os.path.join(os.path.expanduser("~"), ".ssh", "openclaw-mux"))
+SSH_CONTROL_PERSIST = "10m"
+
+# Per-suite timing history, one JSON line per run, kept outside the project so
+# it neither dirties the tree nor the result-cache fingerprint
+HISTORY_DIR = os.environ.get(
+    "OPENCLAW_TEST_HISTORY_DIR", os.path.join(os.path.expanduser("~"), ".openclaw", "test-history"))
+HISTORY_KEEP = 1000
+# --capture: full suite logs are spilled here, one file per suite/shard
+LOG_DIR = os.environ.get(
+    "OPENCLAW_TEST_LOG_DIR", os.path.join(os.path.expanduser("~"), ".openclaw", "test-logs"))
+CAPTURE_TAIL = 40
+EXCERPT_LINES = 60
+FAILED_TEST = re.compile(r"^\s*(?:FAIL|FAILED|✗|×|✘|●|not ok)\s+\S|^\s*\d+\) \S")
+ERROR_START = re.compile(
+    r"\b\w*(?:Error|Exception)\b(?::|$)|^\s*(?:error|ERR!|npm error)\b|"
+    r"\bexpected\b.*\b(?:to|but)\b|^\s*(?:Expected|Received):", re.IGNORECASE)
+STACK_FRAME = re.compile(r"^\s+at\s|^\s+File \"")
+# Remote suites run on a pty, so their output comes with colours
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+# report: compare the latest run with the median of this many earlier passes
+REPORT_WINDOW = 10
+REPORT_THRESHOLD = 1.5
+
+# Serialises prefixed output lines from concurrently running suites
+_print_lock = threading.Lock()
+
+def emit(line):
+    with _print_lock:
+        print(line, flush=True)
+
+def ssh_argv(target, remote_cmd, master=False, tty=False):
+    argv = shlex.split(SSH) + ["-o", "ConnectTimeout=15"]
+    # The Windows OpenSSH client has no connection multiplexing
+    if os.name != 'nt':
+        argv += ["-o", f"ControlPath={os.path.join(SSH_CONTROL_DIR, '%C')}"]
+        if master:
+            argv += ["-o", "ControlMaster=auto", "-o", f"ControlPersist={SSH_CONTROL_PERSIST}"]
+    if tty:
+        # With a pty, sshd hangs up the remote command's session when the
+        # connection goes away, so killing our ssh client ends npm and its
+        # children on the host too instead of orphaning them there
+        argv.append("-tt")
+    return argv + [target, remote_cmd]
+
+def open_ssh_master(target):
+    """Start (or reuse) the shared connection before suites fan out.
+
+    Suites only attach to an existing master, so running them in parallel
+    costs one handshake instead of one per suite; if the master is gone they
+    fall back to a normal connection.
+    """
+    if os.name != 'nt':
+        os.makedirs(SSH_CONTROL_DIR, mode=0o700, exist_ok=True)
+    # The persisted master inherits our stdio, so don't hand it pipes we'd wait on
+    try:
+        return subprocess.run(ssh_argv(target, "exit", master=True), stdin=subprocess.DEVNULL,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              timeout=60).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+def start_command(cmd, cwd, ssh_target=None):
     if ssh_target:
         # Wrap the command in SSH
-        full_cmd = f'ssh {ssh_target} "cd {cwd} && {cmd}"'
-        print(f"Executing remote: {cmd} on {ssh_target}")
+        full_cmd = ssh_argv(ssh_target, f"cd {cwd} && {cmd}", tty=True)
+        emit(f"Executing remote: {cmd} on {ssh_target}")
     else:
         full_cmd = cmd
-        print(f"Executing: {full_cmd}")
+        emit(f"Executing: {full_cmd}")
+
+    # Each suite gets its own process group so cancellation reaches npm's children
+    if os.name == 'nt':
+        group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        group = {"start_new_session": True}
 
+    # We use shell=True to support npm scripts which are often shell commands;
+    # over SSH the remote shell does that and ssh itself is exec'd directly
+    return subprocess.Popen(
+        full_cmd,
+        stdin=subprocess.DEVNULL if ssh_target else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        cwd=None if ssh_target else cwd,
+        shell=not ssh_target,
+        text=True,
+        bufsize=1,
+        universal_newlines=True,
+        **group
+    )
+
+def kill_process_group(process, force=False):
+    # Don't poll(): reaping here would steal the exit status from wait_with_usage
+    if process.returncode is not None:
+        return
     try:
-        # We use shell=True to support npm scripts which are often shell commands
-        process = subprocess.Popen(
-            full_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            cwd=None if ssh_target else cwd,
-            shell=True,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
-        )
-
-        for line in process.stdout:
-            print(f"  {line.rstrip()}")
+        if os.name == 'nt':
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                           capture_output=True)
+        else:
+            os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+    except (OSError, subprocess.SubprocessError):
+        pass
+
+def wait_with_usage(process):
+    """Reap process; return (cpu_s, peak_rss_mb) for it and its descendants.
 
+    os.wait4 gives this child's own rusage, which RUSAGE_CHILDREN can't when
+    suites run concurrently. Both are None where wait4 is unavailable.
+    """
+    if not hasattr(os, 'wait4'):
         process.wait()
-        return process.returncode
-    except Exception as e:
-        print(f"Error executing command: {e}")
-        return 1
+        return None, None
+    _, status, ru = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = ru.ru_maxrss / (1 << 20 if sys.platform == 'darwin' else 1 << 10)
+    return round(ru.ru_utime + ru.ru_stime, 3), round(rss, 1)
+
+def format_usage(usage):
+    text = f"{usage['wall_s']:.1f}s"
+    if usage.get("shards"):
+        text = f"{usage['shards']} shards, {text}"
+    if usage.get("cpu_s") is not None:
+        text += f", cpu {usage['cpu_s']:.1f}s, peak {usage['peak_rss_mb']:.0f} MB"
+    return text
+
+class ResultCache:
+    """Remembers which suites passed against which source-tree fingerprint.
+
+    Hashing reuses validate_shared_files' walker and stat cache, so only
+    files whose (size, mtime, inode) changed since the last run are read.
+    """
+
+    def __init__(self, project_path):
+        self.path = os.path.join(project_path, CACHE_FILE)
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.stat = data.get("stat") or {"written_ns": 0, "files": {}}
+        self.results = data.get("results", {})
+        # Keep the cache itself out of commits before fingerprinting the tree
+        vsf.update_gitignore(project_path, [CACHE_FILE])
+        # The stat cache is only as fresh as the hashing, however long the
+        # suites run before save(); edits after this point must stay racy
+        self.hashed_ns = time.time_ns()
+        files = vsf.get_all_protected_files(project_path, self.stat, use_git=False,
+                                            rules=FINGERPRINT_RULES)
+        tree = hashlib.sha256()
+        for rel_path in sorted(files):
+            tree.update(f"{files[rel_path]} {rel_path}\n".encode())
+        self.tree = tree.hexdigest()
+
+    def key(self, suite):
+        return hashlib.sha256(f"{self.tree}\n{SUITES[suite]}".encode()).hexdigest()
+
+    def hit(self, suite):
+        entry = self.results.get(suite)
+        return bool(entry) and entry["fingerprint"] == self.key(suite)
+
+    def record(self, suite):
+        self.results[suite] = {"fingerprint": self.key(suite), "passed_at": time.time()}
+
+    def save(self):
+        self.stat["written_ns"] = self.hashed_ns
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({"stat": self.stat, "results": self.results}, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+def project_key(project_path, ssh_target=None):
+    """A filename-safe id for a project on a given host."""
+    where = f"{ssh_target or ''}:{os.path.abspath(project_path) if not ssh_target else project_path}"
+    name = os.path.basename(project_path.rstrip('/\\')) or 'project'
+    return f"{name}-{hashlib.sha256(where.encode()).hexdigest()[:16]}"
+
+class OutputCapture:
+    """Keep a suite's output off the console: a bounded tail in memory, the
+    full log on disk, and failing test names / error blocks as they stream by.
+    """
+
+    def __init__(self, log_path, tail=CAPTURE_TAIL):
+        self.log_path = log_path
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        self.log = open(log_path, 'w', errors='replace')
+        self.tail = deque(maxlen=tail)
+        self.failed_tests = []
+        self.errors = []
+        self.lines = 0
+        self._block = None
+
+    def feed(self, line):
+        line = ANSI_ESCAPE.sub('', line)
+        self.log.write(line + "\n")
+        self.lines += 1
+        self.tail.append(line)
+        excerpt = sum(len(b) for b in self.errors)
+        if FAILED_TEST.search(line):
+            if line.strip() not in self.failed_tests and len(self.failed_tests) < 20:
+                self.failed_tests.append(line.strip())
+            self._block = None
+        elif self._block is not None and (STACK_FRAME.search(line) or line.startswith((' ', '\t'))):
+            # Continuation of an error block: message lines and a few frames
+            frames = sum(1 for l in self._block if STACK_FRAME.search(l))
+            if line.strip() and len(self._block) < 12 and not (STACK_FRAME.search(line) and frames >= 5):
+                self._block.append(line)
+        elif ERROR_START.search(line) and excerpt < EXCERPT_LINES:
+            if not any(b[0] == line for b in self.errors):
+                self._block = [line]
+                self.errors.append(self._block)
+            else:
+                self._block = None
+        else:
+            self._block = None
+
+    def close(self):
+        self.log.close()
+
+    def summary(self, label):
+        out = [f"--- {label} failure summary ({self.lines} lines captured) ---"]
+        if self.failed_tests:
+            out.append("Failing tests:")
+            out += [f"  {t}" for t in self.failed_tests]
+        if self.errors:
+            out.append("Errors:")
+            budget = EXCERPT_LINES
+            for block in self.errors:
+                if budget <= 0:
+                    out.append("  ...")
+                    break
+                out += [f"  {l}" for l in block[:budget]]
+                budget -= len(block)
+        out.append(f"Last {len(self.tail)} lines:")
+        out += [f"  {l}" for l in self.tail]
+        out.append(f"Full log: {self.log_path}")
+        return "\n".join(out)
+
+class History:
+    """Append-only per-project log of suite timings and resource usage."""
+
+    def __init__(self, project_path, ssh_target=None):
+        self.path = os.path.join(HISTORY_DIR, f"{project_key(project_path, ssh_target)}.jsonl")
+        self.remote = bool(ssh_target)
+
+    def record(self, suite, status, usage):
+        entry = {"at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                 "suite": suite, "status": status, "remote": self.remote, **usage}
+        try:
+            os.makedirs(HISTORY_DIR, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return []
+        if len(entries) > 2 * HISTORY_KEEP:
+            entries = entries[-HISTORY_KEEP:]
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                f.writelines(json.dumps(e) + "\n" for e in entries)
+            os.replace(tmp, self.path)
+        return entries
+
+def regression_report(entries, window=REPORT_WINDOW, threshold=REPORT_THRESHOLD):
+    """Compare each suite's latest pass against the median of the passes before it."""
+    rows = []
+    for suite in ORDER:
+        runs = [e for e in entries if e["suite"] == suite and e["status"] == "passed"]
+        if not runs:
+            continue
+        latest, previous = runs[-1], runs[-1 - window:-1]
+        row = {"suite": suite, "latest": latest, "runs": len(runs), "regressions": []}
+        for metric in ("wall_s", "cpu_s", "peak_rss_mb"):
+            values = [e[metric] for e in previous if e.get(metric) is not None]
+            if not values or latest.get(metric) is None:
+                continue
+            median = statistics.median(values)
+            row[metric] = (latest[metric], median)
+            if median > 0 and latest[metric] > median * threshold:
+                row["regressions"].append(metric)
+        rows.append(row)
+    return rows
+
+def print_report(rows, threshold=REPORT_THRESHOLD):
+    if not rows:
+        print("No test history recorded for this project yet.")
+        return
+    labels = {"wall_s": ("wall", "s"), "cpu_s": ("cpu", "s"), "peak_rss_mb": ("peak rss", " MB")}
+    for row in rows:
+        latest = row["latest"]
+        print(f"\n{row['suite']}: {row['runs']} passing run(s), latest {latest['at']}")
+        for metric, (label, unit) in labels.items():
+            if metric not in row:
+                if latest.get(metric) is not None:
+                    print(f"  {label:<9} {latest[metric]:>9.1f}{unit} (no baseline yet)")
+                continue
+            value, median = row[metric]
+            ratio = value / median if median else 0
+            flag = "  << REGRESSION" if metric in row["regressions"] else ""
+            print(f"  {label:<9} {value:>9.1f}{unit} vs median {median:.1f}{unit} ({ratio:.2f}x){flag}")
+    regressed = [r["suite"] for r in rows if r["regressions"]]
+    if regressed:
+        print(f"\nRegressions (> {threshold}x rolling median): {', '.join(regressed)}")
+    else:
+        print("\nNo regressions against the rolling median.")
+
+def shard_commands(suite, shards, cores=None):
+    """[(label, command)] for one suite, split across shards where supported.
+
+    With cores, each shard's runner is limited to its share of them.
+    """
+    if shards <= 1 or suite not in SHARD_ARGS:
+        return [(suite, SUITES[suite])]
+    extra = ""
+    if cores and suite in SHARD_WORKER_ARGS:
+        extra = SHARD_WORKER_ARGS[suite].format(workers=max(1, cores // shards))
+    return [(f"{suite} {i}/{shards}",
+             SUITES[suite] + SHARD_ARGS[suite].format(index=i, count=shards) + extra)
+            for i in range(1, shards + 1)]
+
+def count_test_files(project_path):
+    """Number of test files in a local project (0 if there are none or it isn't here)."""
+    return sum(1 for _ in vsf.iter_protected_paths(project_path, TEST_FILE_RULES))
+
+def remote_cpu_count(ssh_target):
+    """Core count of the SSH host, or None if it can't be determined."""
+    try:
+        r = subprocess.run(ssh_argv(ssh_target, 'python -c "import os; print(os.cpu_count())"'),
+                           stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=60)
+        return int(r.stdout.strip()) if r.returncode == 0 else None
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+class Job:
+    """One running suite command and its watchdog state."""
+
+    def __init__(self, suite, label, process, timeout=0, idle_timeout=0):
+        self.suite = suite
+        self.label = label
+        self.process = process
+        self.started = self.last_output = time.monotonic()
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.reaped = threading.Event()
+        # Why we stopped it, if we did, and when to escalate / give up on it
+        self.reason = None
+        self.kill_at = None
+        self.abandon_at = None
+
+    def expired(self, now):
+        if self.timeout and now - self.started > self.timeout:
+            return f"timed out after {self.timeout:g}s"
+        if self.idle_timeout and now - self.last_output > self.idle_timeout:
+            return f"timed out with no output for {self.idle_timeout:g}s"
+        return None
+
+    def stop(self, reason, grace):
+        if self.kill_at is not None:
+            return
+        self.reason = self.reason or reason
+        self.kill_at = time.monotonic() + grace
+        kill_process_group(self.process)
+
+    def escalate(self, now, grace):
+        """SIGKILL the group once the grace period is up; True once even that
+        has had its grace period and the job should be given up on."""
+        if self.kill_at is None or self.reaped.is_set() or now < self.kill_at:
+            return False
+        if self.abandon_at is None:
+            self.abandon_at = now + grace
+            kill_process_group(self.process, force=True)
+            return False
+        return now >= self.abandon_at
+
+def parse_timeouts(values):
+    """--timeout values ("SECONDS" or "SUITE=SECONDS") over SUITE_TIMEOUTS."""
+    timeouts = dict(SUITE_TIMEOUTS)
+    for value in values or []:
+        suite, _, seconds = value.rpartition("=")
+        try:
+            seconds = float(seconds)
+        except ValueError:
+            raise ValueError(value) from None
+        if seconds < 0 or (suite and suite not in SUITES):
+            raise ValueError(value)
+        for s in ([suite] if suite else SUITES):
+            timeouts[s] = seconds
+    return timeouts
+
+def run_suites(suites, project_path, ssh_target=None, cache=None, use_cache=True,
+               history=None, shards=1, capture=False, timeouts=None,
+               idle_timeout=IDLE_TIMEOUT, kill_grace=KILL_GRACE, cores=None):
+    """Run suites concurrently as their dependencies allow.
+
+    Returns the name of the first failed suite, or None if all passed. On
+    failure, running siblings are killed and pending suites never start.
+    Suites that passed against the same fingerprint are replayed from cache.
+    Shardable suites run as `shards` parallel jobs merged into one result,
+    sharing `cores` between them.
+    With capture, output is kept off the console and only a failure summary
+    is printed.
+
+    Jobs that run past their timeout or go quiet for idle_timeout are
+    stopped and fail their suite. On Ctrl-C every running job is stopped,
+    the partial results are printed and KeyboardInterrupt is re-raised.
+    """
+    timeouts = SUITE_TIMEOUTS if timeouts is None else timeouts
+    pending = [s for s in ORDER if s in suites]
+    outcome = {}
+    running = {}
+    # suite -> {"started", "outstanding", "usage"} while any of its jobs run
+    progress = {}
+    done = queue.Queue()
+    passed = set()
+    failed = None
+
+    log_dir = os.path.join(LOG_DIR, project_key(project_path, ssh_target))
+    captures = {}
+
+    def worker(job):
+        prefix = f"  [{job.label}] "
+        cap = captures.get(job.label)
+        for line in job.process.stdout:
+            job.last_output = time.monotonic()
+            if cap:
+                cap.feed(line.rstrip())
+            else:
+                emit(f"{prefix}{line.rstrip()}")
+        cpu_s, peak_rss_mb = wait_with_usage(job.process)
+        if cap:
+            cap.close()
+        job.reaped.set()
+        done.put((job, job.process.returncode, cpu_s, peak_rss_mb))
+
+    def cancel(reason):
+        pending.clear()
+        for job in running.values():
+            job.stop(reason, kill_grace)
+
+    def watchdog():
+        now = time.monotonic()
+        for job in list(running.values()):
+            if job.kill_at is None:
+                reason = job.expired(now)
+                if reason:
+                    emit(f"Stopping {job.label}: {reason}.")
+                    job.stop(reason, kill_grace)
+            elif job.escalate(now, kill_grace):
+                # Something in the group survived SIGKILL (or escaped it) and
+                # still holds the output pipe; stop waiting for it
+                emit(f"Warning: {job.label} did not exit after SIGKILL; abandoning it.")
+                running.pop(job.label)
+                finish(job, -9, None, None)
+
+    def start_ready():
+        nonlocal failed
+        for s in list(pending):
+            deps = [d for d in DEPENDS.get(s, []) if d in suites]
+            if not all(d in passed for d in deps):
+                continue
+            pending.remove(s)
+            if cache and use_cache and cache.hit(s):
+                emit(f"\nResult: {s} passed successfully (cached).")
+                passed.add(s)
+                outcome[s] = "passed (cached)"
+                continue
+            jobs = shard_commands(s, shards, cores)
+            emit(f"\nRunning: {s} tests..." if len(jobs) == 1
+                 else f"\nRunning: {s} tests in {len(jobs)} shards...")
+            progress[s] = {"started": time.monotonic(), "outstanding": len(jobs),
+                           "cpu_s": 0.0, "peak_rss_mb": 0.0, "shards": len(jobs)}
+            for label, cmd in jobs:
+                if capture:
+                    name = re.sub(r'[^\w.-]+', '-', label.replace('/', 'of'))
+                    captures[label] = OutputCapture(os.path.join(log_dir, f"{name}.log"))
+                try:
+                    process = start_command(cmd, project_path, ssh_target)
+                except Exception as e:
+                    emit(f"Error executing command: {e}")
+                    failed = s
+                    outcome[s] = "failed"
+                    cancel("cancelled")
+                    return
+                job = Job(s, label, process, timeouts.get(s, 0), idle_timeout)
+                running[label] = job
+                threading.Thread(target=worker, args=(job,), daemon=True).start()
+
+    def finish(job, retcode, cpu_s, peak_rss_mb):
+        nonlocal failed
+        name, label = job.suite, job.label
+        if failed or interrupted:
+            # Killed by cancellation; its timing says nothing about the suite
+            return
+        p = progress[name]
+        p["outstanding"] -= 1
+        if cpu_s is not None:
+            p["cpu_s"] += cpu_s
+            p["peak_rss_mb"] = max(p["peak_rss_mb"], peak_rss_mb)
+        # Anything the watchdog stopped failed, however it exited
+        timed_out = job.reason is not None
+        if retcode == 0 and not timed_out and p["outstanding"]:
+            emit(f"Result: {label} passed.")
+            return
+
+        usage = {"wall_s": round(time.monotonic() - p["started"], 3)}
+        if not ssh_target and cpu_s is not None:
+            # Over SSH these would only describe the local ssh client
+            usage.update(cpu_s=round(p["cpu_s"], 3), peak_rss_mb=p["peak_rss_mb"])
+        if p["shards"] > 1:
+            usage["shards"] = p["shards"]
+        status = "timeout" if timed_out else "passed" if retcode == 0 else "failed"
+        if history:
+            history.record(name, status, usage)
+        if status != "passed":
+            outcome[name] = job.reason if timed_out else "failed"
+            emit(f"Result: {label} {outcome[name]} ({format_usage(usage)}).")
+            if label in captures:
+                emit(captures[label].summary(label))
+            failed = name
+            cancel("cancelled")
+            return
+        passed.add(name)
+        outcome[name] = "passed"
+        if cache:
+            cache.record(name)
+        emit(f"Result: {name} passed successfully ({format_usage(usage)}).")
+
+    interrupted = False
+    while pending or running:
+        try:
+            if not failed and not interrupted:
+                start_ready()
+            if not running:
+                if pending and not failed:
+                    # Cache hits may have unblocked dependants
+                    continue
+                break
+            try:
+                job, retcode, cpu_s, peak_rss_mb = done.get(timeout=WATCHDOG_TICK)
+            except queue.Empty:
+                watchdog()
+                continue
+            if running.get(job.label) is not job:
+                # Already abandoned by the watchdog
+                continue
+            running.pop(job.label)
+            finish(job, retcode, cpu_s, peak_rss_mb)
+        except KeyboardInterrupt:
+            if not interrupted:
+                interrupted = True
+                emit("\nInterrupted; stopping running suites...")
+                cancel("interrupted")
+            else:
+                # A second Ctrl-C skips the rest of the SIGTERM grace period
+                for job in running.values():
+                    job.kill_at = 0
+
+    for s in ORDER:
+        if s in suites and s not in outcome:
+            stopped = "interrupted" if interrupted else "cancelled"
+            outcome[s] = stopped if s in progress else "not run"
+    if len(outcome) > 1 or interrupted:
+        emit("\nSummary: " + ", ".join(f"{s} {outcome[s]}" for s in ORDER if s in outcome))
+    if interrupted:
+        raise KeyboardInterrupt
+    return failed
 
 def main():
     parser = argparse.ArgumentParser(description="OpenClaw Test Runner")
     parser.add_argument("project_path", help="Path to the project")
-    parser.add_argument("suite", nargs="?", default="all", choices=["unit", "integration", "build", "all"], help="Test suite to run")
+    parser.add_argument("suite", nargs="?", default="all", choices=["unit", "integration", "build", "all", "report"],
+                        help="Test suite to run, or 'report' for timing regressions")
     parser.add_argument("--ssh", help="SSH target (e.g. user@host) for remote execution")
-    
+    parser.add_argument("--shards", default="1",
+                        help="Split the unit suite into N parallel shards, each limited to its "
+                             "share of the cores ('auto' = one per core on the machine running "
+                             f"the tests, at most {AUTO_SHARDS_MAX} and at most one per test file)")
+    parser.add_argument("--capture", action="store_true",
+                        help="Don't stream suite output; on failure print a compact summary "
+                             "and the path of the full log")
+    parser.add_argument("--timeout", action="append", metavar="[SUITE=]SECONDS",
+                        help="Wall-clock limit per suite job, for every suite or just SUITE; "
+                             "0 disables (defaults: " +
+                             ", ".join(f"{s} {t // 60}m" for s, t in SUITE_TIMEOUTS.items()) + ")")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT, metavar="SECONDS",
+                        help="Stop a suite that prints nothing for this long; 0 disables "
+                             f"(default {IDLE_TIMEOUT}s)")
+    parser.add_argument("--kill-grace", type=float, default=KILL_GRACE, metavar="SECONDS",
+                        help="How long a stopped suite gets between SIGTERM and SIGKILL "
+                             f"(default {KILL_GRACE:g}s)")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="Re-run suites even if they passed on an identical source tree")
+
     args = parser.parse_args()
 
     project_path = args.project_path
     suite = args.suite
     ssh_target = args.ssh
 
+    history = History(project_path, ssh_target)
+    if suite == "report":
+        print_report(regression_report(history.load()))
+        sys.exit(0)
+
     if suite == "all":
-        suites_to_run = ["unit", "build", "integration"]
+        suites_to_run = list(ORDER)
     else:
         suites_to_run = [suite]
 
-    print(f"\nStarting test execution for project: {os.path.basename(project_path)}")
-    
+    if args.shards == "auto":
+        shards = None
+    else:
+        try:
+            shards = int(args.shards)
+        except ValueError:
+            shards = 0
+        if shards < 1:
+            print("Error: --shards must be a positive integer or 'auto'.")
+            sys.exit(1)
+
+    try:
+        timeouts = parse_timeouts(args.timeout)
+    except ValueError as e:
+        print(f"Error: invalid --timeout '{e}'; expected SECONDS or SUITE=SECONDS.")
+        sys.exit(1)
+    if args.idle_timeout < 0 or args.kill_grace < 0:
+        print("Error: --idle-timeout and --kill-grace must not be negative.")
+        sys.exit(1)
+
     for s in suites_to_run:
-        cmd = SUITES.get(s)
-        if not cmd:
+        if not SUITES.get(s):
             print(f"Error: Command for suite '{s}' not found.")
             sys.exit(1)
-            
-        print(f"\nRunning: {s} tests...")
-        retcode = run_command(cmd, project_path, ssh_target)
-        
-        if retcode != 0:
-            print(f"\n{s.capitalize()} tests failed. Fix the above errors before committing.")
-            sys.exit(1)
-        
-        print(f"Result: {s} passed successfully.")
+
+    print(f"\nStarting test execution for project: {os.path.basename(project_path)}")
+
+    # The fingerprint needs the tree on this machine; remote runs aren't cached
+    cache = None
+    if not ssh_target and os.path.isdir(project_path):
+        cache = ResultCache(project_path)
+
+    if ssh_target:
+        if open_ssh_master(ssh_target):
+            print(f"Connected to remote {ssh_target} (shared connection)")
+        else:
+            print(f"Warning: could not open a shared connection to remote {ssh_target}; "
+                  "each suite will connect on its own")
+
+    cores = None
+    if shards != 1 and any(s in SHARD_ARGS for s in suites_to_run):
+        cores = (remote_cpu_count(ssh_target) if ssh_target else os.cpu_count()) or 1
+    if shards is None:
+        shards = min(cores or 1, AUTO_SHARDS_MAX)
+        # Vitest refuses more shards than test files; remote trees can't be counted
+        test_files = 0 if ssh_target else count_test_files(project_path)
+        if test_files:
+            shards = min(shards, test_files)
+
+    if os.name != 'nt':
+        # Treat being killed like Ctrl-C so suites' process groups go with us
+        def on_sigterm(signum, frame):
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM, on_sigterm)
+
+    try:
+        failed = run_suites(suites_to_run, project_path, ssh_target, cache, args.use_cache,
+                            history, shards, args.capture, timeouts,
+                            args.idle_timeout, args.kill_grace, cores)
+    except KeyboardInterrupt:
+        emit("\nTest run interrupted.")
+        sys.exit(130)
+    finally:
+        if cache:
+            cache.save()
+    if failed:
+        emit(f"\n{failed.capitalize()} tests failed. Fix the above errors before committing.")
+        sys.exit(1)
 
     print("\nAll tests passed.")
     sys.exit(0)
@@ -1,8 +1,25 @@
 import os
 import sys
+import copy
 import json
+import math
+import zlib
+import time
 import argparse
-from datetime import datetime
+import itertools
+from types import SimpleNamespace
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# sqlite3, gzip, tempfile, socket and the server modules are imported where
+# they're used: every CLI call pays for its imports, and a client talking to
+# `serve` needs none of them
+
+try:
+    import fcntl
+except ImportError:
+    # Windows dev machines; the NAS is Linux and always has fcntl
+    fcntl = None
 
 # Path to the data file, defaults to local during dev/test if not on NAS
 DEFAULT_NAS_PATH = "/volume1/docker/nasopenclaw/tasks.json"
@@ -13,86 +30,1049 @@ nas_dir = os.path.dirname(DATA_FILE)
 if not os.path.exists(nas_dir):
     DATA_FILE = "tasks.json"
 
-def load_tasks():
+# Storage backend: "json" (tasks.json, the default), "sqlite" (indexed, WAL mode)
+# or "journal" (append-only event log compacted into tasks.json)
+BACKEND = os.getenv("OPENCLAW_TASKS_BACKEND", "json")
+DB_FILE = os.getenv("OPENCLAW_TASKS_DB", os.path.splitext(DATA_FILE)[0] + ".db")
+JOURNAL_FILE = os.getenv("OPENCLAW_TASKS_JOURNAL", os.path.splitext(DATA_FILE)[0] + ".journal.jsonl")
+# Fold the journal into the tasks.json snapshot once it grows past this size
+JOURNAL_COMPACT_BYTES = int(os.getenv("OPENCLAW_TASKS_COMPACT_BYTES", 256 * 1024))
+
+# Readers take a shared lock, read-modify-write takes an exclusive one
+LOCK_FILE = os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), ".tasks.lock")
+LOCK_TIMEOUT = float(os.getenv("OPENCLAW_TASKS_LOCK_TIMEOUT", 10))
+
+# `serve` listens here; the CLI tries it first and falls back to the files
+SOCKET_PATH = os.getenv("OPENCLAW_TASKS_SOCKET",
+                        os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), ".tasks.sock"))
+
+# Per-day id counters for the file backends, bumped under the write lock
+SEQ_FILE = os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), ".tasks.seq")
+SEQ_KEEP_DAYS = 7
+
+# Hot set kept in the primary store; older tasks roll into gzip JSONL
+# segments under ARCHIVE_DIR, one per month of created_at
+MAX_TASKS = int(os.getenv("OPENCLAW_TASKS_RETAIN", 100))
+ARCHIVE_DIR = os.getenv("OPENCLAW_TASKS_ARCHIVE",
+                        os.path.join(os.path.dirname(os.path.abspath(DATA_FILE)), "archive"))
+
+class TaskStoreError(Exception):
+    pass
+
+@contextmanager
+def tasks_lock(exclusive):
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        mode = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        delay = 0.005
+        while True:
+            try:
+                fcntl.flock(fd, mode)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise TaskStoreError(f"timed out after {LOCK_TIMEOUT:g}s waiting for {LOCK_FILE}")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+def format_task_id(day, n):
+    # task_YYYYMMDD_NNNNNN; fixed width, so ids sort chronologically up to
+    # a million tasks a day
+    return f"task_{day}_{n:06d}"
+
+def _highest_for_day(day, ids):
+    prefix = f"task_{day}_"
+    return max((int(i[len(prefix):]) for i in ids
+                if i.startswith(prefix) and i[len(prefix):].isdigit()), default=0)
+
+def stamp_created(task):
+    """Set a new task's creation time and return its UTC day (YYYYMMDD).
+
+    Stores call this under their write lock, right before allocating the
+    id, so id order, creation time and commit order all agree.
+    """
+    now = utc_now()
+    task["created_at"] = task["updated_at"] = now
+    if task.get("transitions"):
+        task["transitions"][0]["at"] = now
+    return now[:10].replace("-", "")
+
+def allocate_task_id(task, existing):
+    """Stamp a new task and give it the next task_YYYYMMDD_NNNNNN, in O(1).
+
+    Callers hold the exclusive tasks lock. Counters for the last
+    SEQ_KEEP_DAYS days live in SEQ_FILE and are persisted before the task
+    itself, so a crash can skip a number but never hand one out twice.
+    Only a day with no counter that isn't newer than every kept day (first
+    run, the file was deleted, or the clock stepped back) is seeded from
+    `existing()`.
+    """
+    day = stamp_created(task)
+    try:
+        with open(SEQ_FILE, 'r') as f:
+            seq = json.load(f)
+    except (OSError, ValueError):
+        seq = {}
+    if "day" in seq:
+        # Single-counter file from before counters were kept per day
+        seq = {"days": {seq["day"]: seq["n"]}}
+    days = seq.get("days", {})
+    if day in days:
+        n = days[day] + 1
+    elif days and day > max(days):
+        n = 1
+    else:
+        n = _highest_for_day(day, (t["id"] for t in existing())) + 1
+    days[day] = n
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(prefix=".tasks.seq.", suffix=".tmp", dir=os.path.dirname(SEQ_FILE))
+    _keep_mode(fd, SEQ_FILE)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({"days": dict(sorted(days.items())[-SEQ_KEEP_DAYS:])}, f)
+    os.replace(tmp_path, SEQ_FILE)
+    return format_task_id(day, n)
+
+def _keep_mode(fd, path):
+    # mkstemp files are 0600; give the replacement the mode the file already
+    # has (or would get from a plain open) so it stays shared on the NAS
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    if hasattr(os, "fchmod"):
+        os.fchmod(fd, mode)
+
+def load_tasks(strict=False):
     if not os.path.exists(DATA_FILE):
         return []
     try:
         with open(DATA_FILE, 'r') as f:
             return json.load(f)
-    except Exception:
+    except Exception as e:
+        # Writers must not replace an unreadable file with a fresh list
+        if strict:
+            raise TaskStoreError(f"{DATA_FILE} is unreadable ({e}); refusing to overwrite it")
         return []
 
+def archive_tasks(tasks):
+    # Callers hold the store's write lock. Archiving happens before the hot
+    # store drops the tasks, so a crash in between can only duplicate them.
+    if not tasks:
+        return
+    import gzip
+    by_month = {}
+    for t in tasks:
+        by_month.setdefault(t["created_at"][:7], []).append(t)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    for month, batch in by_month.items():
+        # Appending adds a gzip member; readers see one continuous stream
+        path = os.path.join(ARCHIVE_DIR, f"tasks-{month}.jsonl.gz")
+        with gzip.open(path, 'at', compresslevel=6) as f:
+            for t in batch:
+                f.write(json.dumps(t, separators=(',', ':')) + "\n")
+
+def _segment_lines(path):
+    """Lines of a gzip segment, member by member. A member torn by a crash
+    mid-append is skipped; members appended after it are still read."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos = 0
+    while pos < len(data):
+        member = zlib.decompressobj(wbits=31)
+        try:
+            text = member.decompress(data[pos:])
+            if not member.eof:
+                raise zlib.error("truncated member")
+        except zlib.error:
+            # Resync on the next gzip header
+            pos = data.find(b"\x1f\x8b\x08", pos + 1)
+            if pos < 0:
+                return
+            continue
+        pos = len(data) - len(member.unused_data)
+        yield from text.decode('utf-8', errors='replace').splitlines()
+
+def iter_archived(since=None):
+    """Yield archived tasks oldest first, opening only segments from `since` on."""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return
+    seen = set()
+    for name in sorted(os.listdir(ARCHIVE_DIR)):
+        if not (name.startswith("tasks-") and name.endswith(".jsonl.gz")):
+            continue
+        month = name[len("tasks-"):-len(".jsonl.gz")]
+        if since and month < since[:7]:
+            continue
+        try:
+            lines = list(_segment_lines(os.path.join(ARCHIVE_DIR, name)))
+        except OSError:
+            continue
+        for line in lines:
+            try:
+                t = json.loads(line)
+            except ValueError:
+                continue
+            if since and t["created_at"] < since:
+                continue
+            if t["id"] in seen:
+                continue
+            seen.add(t["id"])
+            yield t
+
 def save_tasks(tasks):
-    # Keep only last 100
-    tasks = tasks[-100:]
+    # Keep only the last MAX_TASKS, rolling the rest into the archive
+    archive_tasks(tasks[:-MAX_TASKS])
+    tasks = tasks[-MAX_TASKS:]
+    # Write to a temp file in the same directory, then swap it in atomically
+    # so readers never see a truncated tasks.json
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(prefix=".tasks.", suffix=".tmp",
+                                    dir=os.path.dirname(os.path.abspath(DATA_FILE)))
     try:
-        with open(DATA_FILE, 'w') as f:
+        _keep_mode(fd, DATA_FILE)
+        with os.fdopen(fd, 'w') as f:
             json.dump(tasks, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, DATA_FILE)
     except Exception as e:
-        print(f"Error saving tasks: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise TaskStoreError(f"saving tasks: {e}")
 
-def create_task(project, description, model):
-    tasks = load_tasks()
-    task_id = f"task_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}"
+def _stat_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def apply_changes(task, changes):
+    # Every state change is kept with its timestamp so `stats` can measure
+    # time-in-state; tasks from before transitions were recorded have none
+    if "state" in changes and changes["state"] != task["state"]:
+        transition = {"state": changes["state"], "at": changes["updated_at"]}
+        transitions = task.setdefault("transitions", [])
+        # Replaying a journal over a snapshot that already has it is a no-op
+        if transition not in transitions:
+            transitions.append(transition)
+    task.update(changes)
+
+def matches(task, project=None, state=None, since=None, until=None, field="updated_at"):
+    # since is inclusive, until exclusive; ISO timestamps compare as strings
+    if project and task["project"] != project:
+        return False
+    if state and task["state"] != state:
+        return False
+    if since and task[field] < since:
+        return False
+    if until and task[field] >= until:
+        return False
+    return True
+
+def paginate(tasks, cursor=None, offset=0, limit=None, keep=None):
+    """Lazily skip past `cursor` (the last id of the previous page), then
+    filter with `keep` and skip `offset`.
+
+    The cursor is found before filtering, so a page still continues after
+    it when that task has since stopped matching (e.g. changed state).
+    """
+    tasks = iter(tasks)
+    if cursor:
+        # An unknown cursor exhausts the iterator: an empty page, not page one
+        for t in tasks:
+            if t["id"] == cursor:
+                break
+    if keep:
+        tasks = filter(keep, tasks)
+    return itertools.islice(tasks, offset, None if limit is None else offset + limit)
+
+def filter_newest_first(tasks, project=None, state=None, since=None, until=None,
+                        cursor=None, offset=0, limit=None):
+    return paginate(reversed(tasks), cursor, offset, limit,
+                    lambda t: matches(t, project, state, since, until))
+
+class ListSession:
+    """In-memory view handed out by a store's batch(): operations mutate the
+    loaded list and record journal events, and the store persists them once."""
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.by_id = {t["id"]: t for t in tasks}
+        self.events = []
+
+    def get(self, task_id):
+        return self.by_id.get(task_id)
+
+    def insert(self, task):
+        task["id"] = task["id"] or allocate_task_id(task, lambda: self.tasks)
+        self.tasks.append(task)
+        self.by_id[task["id"]] = task
+        # Later updates in the same batch mutate `task`; the event keeps it as created
+        self.events.append({"op": "create", "task": copy.deepcopy(task)})
+
+    def update(self, task_id, changes):
+        task = self.by_id.get(task_id)
+        if task is not None:
+            apply_changes(task, changes)
+            self.events.append({"op": "update", "id": task_id, "changes": changes})
+        return task
+
+class JsonStore:
+    """The original tasks.json list: every call loads and rewrites the whole file."""
+
+    # Each write drops everything past MAX_TASKS from the hot set
+    trims_on_write = True
+    # (signature before, signature after, reshaped) of the last insert or
+    # update, both read under the write lock; reshaped means the write did
+    # more to the store than that one change (see CachedStore)
+    last_write = None
+
+    def _read(self):
+        with tasks_lock(exclusive=False):
+            return load_tasks()
+
+    def all(self):
+        return self._read()
+
+    def signature(self):
+        return _stat_signature(DATA_FILE)
+
+    def get(self, task_id):
+        for t in self._read():
+            if t["id"] == task_id:
+                return t
+        return None
+
+    def query(self, project=None, state=None, since=None, until=None, cursor=None, offset=0, limit=None):
+        return filter_newest_first(self._read(), project, state, since, until, cursor, offset, limit)
+
+    def insert(self, task):
+        with tasks_lock(exclusive=True):
+            before = self.signature()
+            tasks = load_tasks(strict=True)
+            task["id"] = task["id"] or allocate_task_id(task, lambda: tasks)
+            tasks.append(task)
+            save_tasks(tasks)
+            self.last_write = (before, self.signature(), False)
+
+    def update(self, task_id, changes):
+        with tasks_lock(exclusive=True):
+            before = self.signature()
+            tasks = load_tasks(strict=True)
+            for task in tasks:
+                if task["id"] == task_id:
+                    apply_changes(task, changes)
+                    save_tasks(tasks)
+                    self.last_write = (before, self.signature(), False)
+                    return task
+        return None
+
+    @contextmanager
+    def batch(self):
+        with tasks_lock(exclusive=True):
+            session = ListSession(load_tasks(strict=True))
+            yield session
+            if session.events:
+                save_tasks(session.tasks)
+
+class SqliteStore:
+    """Tasks in a WAL-mode SQLite file with id/project/state/updated_at indexed.
+
+    The full task dict is kept as JSON in `data`; the indexed fields are
+    duplicated into columns so lookups never have to decode every row.
+    `seq` preserves insertion order, which is what "newest first" means.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+            id         TEXT NOT NULL UNIQUE,
+            project    TEXT NOT NULL,
+            state      TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            data       TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_project_state ON tasks(project, state, seq);
+        CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks(state, seq);
+        CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks(updated_at);
+        CREATE TABLE IF NOT EXISTS id_counter (
+            day TEXT PRIMARY KEY,
+            n   INTEGER NOT NULL
+        );
+    """
+
+    trims_on_write = True
+    last_write = None
+
+    def __init__(self, path=None):
+        import sqlite3
+        self.path = path or DB_FILE
+        # The serve daemon shares one connection across handler threads,
+        # serialized by its own lock
+        self.conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def all(self):
+        return [json.loads(row[0]) for row in self.conn.execute("SELECT data FROM tasks ORDER BY seq")]
+
+    def signature(self):
+        # Bumped whenever another connection commits
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def get(self, task_id):
+        row = self.conn.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, project=None, state=None, since=None, until=None, cursor=None, offset=0, limit=None):
+        sql = "SELECT data FROM tasks"
+        where, params = [], []
+        if project:
+            where.append("project = ?")
+            params.append(project)
+        if state:
+            where.append("state = ?")
+            params.append(state)
+        if since:
+            where.append("updated_at >= ?")
+            params.append(since)
+        if until:
+            where.append("updated_at < ?")
+            params.append(until)
+        if cursor:
+            where.append("seq < (SELECT seq FROM tasks WHERE id = ?)")
+            params.append(cursor)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY seq DESC LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        for row in self.conn.execute(sql, params):
+            yield json.loads(row[0])
+
+    def _upsert(self, task, replace=True):
+        sql = "INSERT INTO tasks (id, project, state, updated_at, data) VALUES (?, ?, ?, ?, ?)"
+        if replace:
+            sql += (" ON CONFLICT(id) DO UPDATE SET project = excluded.project, state = excluded.state, "
+                    "updated_at = excluded.updated_at, data = excluded.data")
+        self.conn.execute(sql, (task["id"], task["project"], task["state"], task["updated_at"],
+                                json.dumps(task)))
+
+    def _trim(self):
+        # Keep only last MAX_TASKS, same as tasks.json
+        cutoff = self.conn.execute(
+            "SELECT seq FROM tasks ORDER BY seq DESC LIMIT 1 OFFSET ?", (MAX_TASKS,)
+        ).fetchone()
+        if cutoff is None:
+            return
+        archive_tasks([json.loads(row[0]) for row in self.conn.execute(
+            "SELECT data FROM tasks WHERE seq <= ? ORDER BY seq", cutoff)])
+        self.conn.execute("DELETE FROM tasks WHERE seq <= ?", cutoff)
+
+    def _insert(self, task):
+        # Stamped and allocated inside the write transaction, so id order is
+        # commit order. Each day keeps its own counter row.
+        if not task["id"]:
+            day = stamp_created(task)
+            row = self.conn.execute("SELECT n FROM id_counter WHERE day = ?", (day,)).fetchone()
+            if row is None:
+                prefix = f"task_{day}_"
+                ids = (r[0] for r in self.conn.execute(
+                    "SELECT id FROM tasks WHERE id >= ? AND id < ?", (prefix, prefix + "~")))
+                n = _highest_for_day(day, ids) + 1
+                self.conn.execute("INSERT INTO id_counter (day, n) VALUES (?, ?)", (day, n))
+            else:
+                n = row[0] + 1
+                self.conn.execute("UPDATE id_counter SET n = ? WHERE day = ?", (n, day))
+            task["id"] = format_task_id(day, n)
+        import sqlite3
+        try:
+            # Never replace: a clash means the counter went wrong
+            self._upsert(task, replace=False)
+        except sqlite3.IntegrityError:
+            raise TaskStoreError(f"task id {task['id']} already exists")
+
+    def _update(self, task_id, changes):
+        task = self.get(task_id)
+        if task is not None:
+            apply_changes(task, changes)
+            self._upsert(task)
+        return task
+
+    def insert(self, task):
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            before = self.signature()
+            self._insert(task)
+            self._trim()
+        # Our own commits don't move data_version
+        self.last_write = (before, before, False)
+
+    def update(self, task_id, changes):
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            before = self.signature()
+            task = self._update(task_id, changes)
+        if task is not None:
+            self.last_write = (before, before, False)
+        return task
+
+    @contextmanager
+    def batch(self):
+        # One transaction for the whole batch
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            yield SimpleNamespace(get=self.get, insert=self._insert, update=self._update)
+            self._trim()
+
+    def import_json(self, path):
+        with open(path, 'r') as f:
+            tasks = json.load(f)
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for task in tasks:
+                self._upsert(task)
+            self._trim()
+        return len(tasks)
+
+class JournalStore:
+    """tasks.json as a snapshot plus an append-only log of compact JSON events.
+
+    create/update append a single line instead of rewriting the list. Reads
+    replay the journal tail on top of the snapshot; once the journal passes
+    JOURNAL_COMPACT_BYTES it is folded into tasks.json and truncated. Replay
+    is idempotent (creates upsert by id, updates set fields), so a crash
+    between writing the snapshot and truncating the journal loses nothing.
+    """
+
+    # The hot set only shrinks back to MAX_TASKS at compaction
+    trims_on_write = False
+    last_write = None
+
+    def _load(self, strict=False):
+        tasks = {t["id"]: t for t in load_tasks(strict)}
+        if os.path.exists(JOURNAL_FILE):
+            with open(JOURNAL_FILE, 'r') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash mid-append
+                        continue
+                    if event["op"] == "create":
+                        tasks[event["task"]["id"]] = event["task"]
+                    elif event["op"] == "update" and event["id"] in tasks:
+                        apply_changes(tasks[event["id"]], event["changes"])
+        # Untrimmed: compaction hands the overflow to the archive
+        return list(tasks.values())
+
+    def _read(self):
+        # The overflow stays readable here until compaction archives it
+        with tasks_lock(exclusive=False):
+            return self._load()
+
+    def all(self):
+        return self._read()
+
+    def signature(self):
+        return (_stat_signature(DATA_FILE), _stat_signature(JOURNAL_FILE))
+
+    # Callers of _append/_compact must hold the exclusive lock
+    def _append(self, *events):
+        """Append events; True if that pushed the journal into compaction."""
+        with open(JOURNAL_FILE, 'a') as f:
+            f.write("".join(json.dumps(e, separators=(',', ':')) + "\n" for e in events))
+            size = f.tell()
+        if size >= JOURNAL_COMPACT_BYTES:
+            self._compact()
+            return True
+        return False
+
+    def _compact(self):
+        save_tasks(self._load(strict=True))
+        open(JOURNAL_FILE, 'w').close()
+
+    def compact(self):
+        with tasks_lock(exclusive=True):
+            self._compact()
+
+    def get(self, task_id):
+        for t in self._read():
+            if t["id"] == task_id:
+                return t
+        return None
+
+    def query(self, project=None, state=None, since=None, until=None, cursor=None, offset=0, limit=None):
+        return filter_newest_first(self._read(), project, state, since, until, cursor, offset, limit)
+
+    def insert(self, task):
+        with tasks_lock(exclusive=True):
+            before = self.signature()
+            task["id"] = task["id"] or allocate_task_id(task, lambda: self._load(strict=True))
+            # Compaction archives the overflow, which a cache can't mirror
+            compacted = self._append({"op": "create", "task": task})
+            self.last_write = (before, self.signature(), compacted)
+
+    def update(self, task_id, changes):
+        with tasks_lock(exclusive=True):
+            before = self.signature()
+            for task in self._load(strict=True):
+                if task["id"] == task_id:
+                    compacted = self._append({"op": "update", "id": task_id, "changes": changes})
+                    self.last_write = (before, self.signature(), compacted)
+                    apply_changes(task, changes)
+                    return task
+        return None
+
+    @contextmanager
+    def batch(self):
+        with tasks_lock(exclusive=True):
+            session = ListSession(self._load(strict=True))
+            yield session
+            if session.events:
+                self._append(*session.events)
+
+STORES = {
+    "json": JsonStore,
+    "sqlite": SqliteStore,
+    "journal": JournalStore,
+}
+
+def get_store():
+    if BACKEND not in STORES:
+        print(f"Error: Unknown backend '{BACKEND}'. Choose from: {', '.join(STORES)}")
+        sys.exit(1)
+    return STORES[BACKEND]()
+
+class CachedStore:
+    """Keeps the backend's task list in memory for the `serve` daemon.
+
+    Writes go through to the backend so the files stay authoritative. The
+    cache is reloaded whenever the backend's signature moves without us
+    (someone used the files directly while the daemon was running), judged
+    by the signatures the backend saw under its own lock.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.tasks = None
+        self.sig = None
+
+    def _tasks(self):
+        sig = self.store.signature()
+        if self.tasks is None or sig != self.sig:
+            self.tasks = self.store.all()
+            self.sig = sig
+        return self.tasks
+
+    def get(self, task_id):
+        for t in self._tasks():
+            if t["id"] == task_id:
+                return t
+        return None
+
+    def query(self, project=None, state=None, since=None, until=None, cursor=None, offset=0, limit=None):
+        return filter_newest_first(self._tasks(), project, state, since, until, cursor, offset, limit)
+
+    def _fold_write(self):
+        """True if the store's last write is the only change since the cache
+        was loaded, so the cache can apply it too and take the new signature.
+        Otherwise (another writer got in first, or the write compacted) the
+        cache is dropped and the next read reloads it."""
+        before, after, reshaped = self.store.last_write
+        if self.tasks is None or reshaped or before != self.sig:
+            self.tasks = None
+            return False
+        self.sig = after
+        return True
+
+    def insert(self, task):
+        self._tasks()
+        self.store.insert(task)
+        if self._fold_write():
+            self.tasks.append(task)
+            if self.store.trims_on_write:
+                del self.tasks[:-MAX_TASKS]
+
+    def update(self, task_id, changes):
+        self._tasks()
+        task = self.store.update(task_id, changes)
+        if task is not None and self._fold_write():
+            for cached in self.tasks:
+                if cached["id"] == task_id:
+                    apply_changes(cached, changes)
+                    break
+        return task
+
+    @contextmanager
+    def batch(self):
+        try:
+            with self.store.batch() as session:
+                yield session
+        finally:
+            self.tasks = None
+
+# Operations shared by the direct CLI path and the daemon; they return data
+# and leave printing to the CLI
+def op_create(store, project, description, model):
+    now = utc_now()
     new_task = {
-        "id": task_id,
+        # Assigned, and the timestamps restamped, by the store under its write lock
+        "id": None,
         "project": project,
         "description": description,
         "model": model,
         "state": "queued",
-        "created_at": datetime.now().isoformat() + "Z",
-        "updated_at": datetime.now().isoformat() + "Z",
+        "created_at": now,
+        "updated_at": now,
         "commit": None,
-        "error": None
+        "error": None,
+        "transitions": [{"state": "queued", "at": now}],
     }
-    tasks.append(new_task)
-    save_tasks(tasks)
-    print(task_id)
+    store.insert(new_task)
+    return new_task
+
+def op_update(store, task_id, state=None, commit=None, error=None):
+    changes = {}
+    if state: changes["state"] = state
+    if commit: changes["commit"] = commit
+    if error: changes["error"] = error
+    changes["updated_at"] = utc_now()
+    return store.update(task_id, changes)
+
+def op_list(store, project=None, state=None, since=None, until=None, cursor=None, offset=0, limit=10):
+    return list(store.query(project, state, since, until, cursor, offset, limit))
+
+def op_show(store, task_id):
+    return store.get(task_id)
+
+def _apply_operation(store, op):
+    if not isinstance(op, dict):
+        return {"status": "error", "error": "not a valid JSON object"}
+    try:
+        if op.get("op") == "create":
+            task = op_create(store, op["project"], op["description"], op["model"])
+            return {"id": task["id"], "status": "created"}
+        if op.get("op") == "update":
+            task_id = op["id"]
+            if op_update(store, task_id, op.get("state"), op.get("commit"), op.get("error")) is None:
+                return {"id": task_id, "status": "error", "error": "not found"}
+            return {"id": task_id, "status": "updated"}
+    except KeyError as e:
+        return {"status": "error", "error": f"missing field {e}"}
+    return {"status": "error", "error": f"unknown op {op.get('op')!r}"}
+
+def op_batch(store, operations):
+    # All operations share one lock and one write
+    with store.batch() as session:
+        return [_apply_operation(session, op) for op in operations]
+
+OPS = {
+    "create": op_create,
+    "update": op_update,
+    "list": op_list,
+    "show": op_show,
+    "batch": op_batch,
+}
+
+def make_server(path):
+    import socketserver
+
+    class TaskRequestHandler(socketserver.StreamRequestHandler):
+        # One JSON object per line in each direction:
+        #   -> {"op": "update", "args": {"task_id": "...", "state": "running"}}
+        #   <- {"ok": true, "result": {...}}  or  {"ok": false, "error": "..."}
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    op = OPS.get(request.get("op"))
+                    if op is None:
+                        raise ValueError(f"unknown op {request.get('op')!r}")
+                    with self.server.lock:
+                        response = {"ok": True, "result": op(self.server.store, **request.get("args", {}))}
+                except (TaskStoreError, TypeError, ValueError, AttributeError) as e:
+                    response = {"ok": False, "error": str(e)}
+                self.wfile.write((json.dumps(response) + "\n").encode())
+                self.wfile.flush()
+
+    class TaskServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    return TaskServer(path, TaskRequestHandler)
+
+def serve():
+    import signal
+    import socket
+    import threading
+    if not hasattr(socket, "AF_UNIX"):
+        print("Error: serve needs Unix domain sockets (Linux/NAS only).")
+        sys.exit(1)
+    if os.path.exists(SOCKET_PATH):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(SOCKET_PATH)
+            print(f"Error: a task_tracker daemon is already listening on {SOCKET_PATH}")
+            sys.exit(1)
+        except OSError:
+            # Stale socket left behind by a crashed daemon
+            os.remove(SOCKET_PATH)
+
+    # Let `kill` (e.g. from the DSM task scheduler) clean up the socket too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    server = make_server(SOCKET_PATH)
+    try:
+        server.store = CachedStore(get_store())
+        server.lock = threading.Lock()
+        os.chmod(SOCKET_PATH, 0o660)
+        print(f"Serving {BACKEND} task store on {SOCKET_PATH}", flush=True)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.remove(SOCKET_PATH)
+        except OSError:
+            pass
+
+def _ask_daemon(op, args):
+    """The daemon's response, or None if nobody is listening on SOCKET_PATH."""
+    import socket
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(LOCK_TIMEOUT + 5)
+            sock.connect(SOCKET_PATH)
+            sock.sendall((json.dumps({"op": op, "args": args}) + "\n").encode())
+            with sock.makefile('r') as f:
+                line = f.readline()
+        return json.loads(line)
+    except (ConnectionRefusedError, FileNotFoundError):
+        # Stale socket: nobody is listening, so use the files
+        return None
+    except (OSError, ValueError) as e:
+        # The daemon may already have applied the request, so it mustn't
+        # be repeated against the files
+        raise TaskStoreError(f"no answer from the daemon on {SOCKET_PATH} "
+                             f"({'connection closed' if isinstance(e, ValueError) else e})")
+
+def call(op, **args):
+    # Ask the daemon if one is listening, otherwise open the store directly
+    response = _ask_daemon(op, args) if os.path.exists(SOCKET_PATH) else None
+    if response is not None:
+        if not response["ok"]:
+            raise TaskStoreError(response["error"])
+        return response["result"]
+    return OPS[op](get_store(), **args)
+
+def create_task(project, description, model):
+    task = call("create", project=project, description=description, model=model)
+    print(task["id"])
 
 def update_task(task_id, state=None, commit=None, error=None):
-    tasks = load_tasks()
-    found = False
-    for task in tasks:
-        if task["id"] == task_id:
-            if state: task["state"] = state
-            if commit: task["commit"] = commit
-            if error: task["error"] = error
-            task["updated_at"] = datetime.now().isoformat() + "Z"
-            found = True
-            break
-    
-    if not found:
+    if call("update", task_id=task_id, state=state, commit=commit, error=error) is None:
         print(f"Error: Task {task_id} not found.")
         sys.exit(1)
-        
-    save_tasks(tasks)
+
     print(f"Task {task_id} updated.")
 
-def list_tasks(project=None, state=None):
-    tasks = load_tasks()
-    filtered = tasks
-    if project:
-        filtered = [t for t in filtered if t["project"] == project]
-    if state:
-        filtered = [t for t in filtered if t["state"] == state]
-    
-    # Show newest first
-    filtered.reverse()
-    
-    print(f"{'ID':<25} | {'Project':<20} | {'State':<10} | {'Updated'}")
-    print("-" * 75)
-    for t in filtered[:10]: # default to last 10 for list
-        print(f"{t['id']:<25} | {t['project']:<20} | {t['state']:<10} | {t['updated_at']}")
+def print_tasks(tasks, fmt="table", limit=None):
+    # Streams: nothing here holds more than one task at a time
+    if fmt == "jsonl":
+        for t in tasks:
+            print(json.dumps(t))
+    elif fmt == "json":
+        print("[", end="")
+        for i, t in enumerate(tasks):
+            print(("," if i else "") + "\n  " + json.dumps(t), end="")
+        print("\n]")
+    else:
+        print(f"{'ID':<25} | {'Project':<20} | {'State':<10} | {'Updated'}")
+        print("-" * 75)
+        last, count = None, 0
+        for t in tasks:
+            print(f"{t['id']:<25} | {t['project']:<20} | {t['state']:<10} | {t['updated_at']}")
+            last, count = t, count + 1
+        if limit and count == limit:
+            print(f"More may follow: --cursor {last['id']}")
 
-def show_task(task_id):
-    tasks = load_tasks()
+def list_tasks(project=None, state=None, archived=False, since=None, until=None,
+               cursor=None, offset=0, limit=None, fmt="table"):
+    if archived:
+        # Full history by default, oldest first, streamed from the archive segments
+        filtered = paginate(iter_archived(since), cursor, offset, limit or None,
+                            lambda t: matches(t, project, state, since, until, field="created_at"))
+    else:
+        # Newest first, default to last 10 for list
+        limit = 10 if limit is None else limit
+        filtered = call("list", project=project, state=state, since=since, until=until,
+                        cursor=cursor, offset=offset, limit=limit or None)
+    print_tasks(filtered, fmt, limit)
+
+TERMINAL_STATES = ("done", "failed")
+
+def parse_timestamp(ts):
+    return datetime.fromisoformat(ts.rstrip("Z"))
+
+def percentile(sorted_values, pct):
+    # Nearest-rank: always one of the observed values
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(tasks):
+    durations = {}
+    done = failed = 0
+    first_created = last_finished = None
     for t in tasks:
-        if t["id"] == task_id:
-            print(json.dumps(t, indent=2))
-            return
+        transitions = t.get("transitions") or []
+        for cur, nxt in zip(transitions, transitions[1:]):
+            seconds = (parse_timestamp(nxt["at"]) - parse_timestamp(cur["at"])).total_seconds()
+            durations.setdefault(cur["state"], []).append(seconds)
+
+        created = parse_timestamp(t["created_at"])
+        if first_created is None or created < first_created:
+            first_created = created
+        if t["state"] in TERMINAL_STATES:
+            if t["state"] == "done":
+                done += 1
+            else:
+                failed += 1
+            finished = parse_timestamp(transitions[-1]["at"] if transitions else t["updated_at"])
+            if last_finished is None or finished > last_finished:
+                last_finished = finished
+
+    hours = None
+    if first_created and last_finished and last_finished > first_created:
+        hours = (last_finished - first_created).total_seconds() / 3600
+    time_in_state = {}
+    for state, values in durations.items():
+        values.sort()
+        time_in_state[state] = {
+            "n": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+    return {
+        "tasks": len(tasks),
+        "done": done,
+        "failed": failed,
+        "failure_rate": failed / (done + failed) if done + failed else None,
+        "tasks_per_hour": (done + failed) / hours if hours else None,
+        "time_in_state": time_in_state,
+    }
+
+def compute_stats(tasks):
+    by_project, by_model = {}, {}
+    for t in tasks:
+        by_project.setdefault(t["project"], []).append(t)
+        by_model.setdefault(t["model"], []).append(t)
+    return {
+        "overall": summarize(tasks),
+        "by_project": {k: summarize(v) for k, v in sorted(by_project.items())},
+        "by_model": {k: summarize(v) for k, v in sorted(by_model.items())},
+    }
+
+def _fmt(value, spec):
+    return "-" if value is None else format(value, spec)
+
+def stats_tasks(project=None, model=None, since=None, archived=False, fmt="table"):
+    tasks = call("list", project=project, since=since, limit=None)
+    if archived:
+        tasks += list(t for t in iter_archived(since) if matches(t, project, field="created_at"))
+    if model:
+        tasks = [t for t in tasks if t["model"] == model]
+    stats = compute_stats(tasks)
+
+    if fmt == "json":
+        print(json.dumps(stats, indent=2))
+        return
+
+    overall = stats["overall"]
+    print(f"Tasks: {overall['tasks']}  done: {overall['done']}  failed: {overall['failed']}  "
+          f"failure rate: {_fmt(overall['failure_rate'], '.1%')}  "
+          f"throughput: {_fmt(overall['tasks_per_hour'], '.2f')} tasks/h")
+    print("")
+    print(f"{'Time in state (s)':<20} | {'n':>5} | {'p50':>9} | {'p95':>9} | {'p99':>9}")
+    print("-" * 65)
+    for state, t in overall["time_in_state"].items():
+        print(f"{state:<20} | {t['n']:>5} | {t['p50']:>9.1f} | {t['p95']:>9.1f} | {t['p99']:>9.1f}")
+
+    for title, groups in (("Project", stats["by_project"]), ("Model", stats["by_model"])):
+        print("")
+        print(f"{title:<30} | {'Tasks':>5} | {'Fail%':>6} | {'Tasks/h':>7} | "
+              f"{'queued p95':>10} | {'running p95':>11} | {'testing p95':>11}")
+        print("-" * 100)
+        for name, g in groups.items():
+            p95 = {s: g["time_in_state"].get(s, {}).get("p95") for s in ("queued", "running", "testing")}
+            print(f"{name:<30} | {g['tasks']:>5} | {_fmt(g['failure_rate'], '.1%'):>6} | "
+                  f"{_fmt(g['tasks_per_hour'], '.2f'):>7} | {_fmt(p95['queued'], '.1f'):>10} | "
+                  f"{_fmt(p95['running'], '.1f'):>11} | {_fmt(p95['testing'], '.1f'):>11}")
+
+def batch_tasks(stream):
+    operations = []
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            operations.append(json.loads(line))
+        except ValueError:
+            # Reported in place so output lines still match input lines
+            operations.append(None)
+    results = call("batch", operations=operations)
+    for result in results:
+        print(json.dumps(result))
+    if any(r["status"] == "error" for r in results):
+        sys.exit(1)
+
+def show_task(task_id):
+    t = call("show", task_id=task_id)
+    if t is not None:
+        print(json.dumps(t, indent=2))
+        return
     print(f"Error: Task {task_id} not found.")
     sys.exit(1)
 
+def import_json(path):
+    if not os.path.exists(path):
+        print(f"Error: {path} not found.")
+        sys.exit(1)
+    try:
+        count = SqliteStore().import_json(path)
+    except (ValueError, KeyError) as e:
+        print(f"Error importing {path}: {e}")
+        sys.exit(1)
+    print(f"Imported {count} tasks from {path} into {DB_FILE}")
+
+def compact_journal():
+    JournalStore().compact()
+    print(f"Compacted {JOURNAL_FILE} into {DATA_FILE}")
+
+def non_negative_int(value):
+    n = int(value)
+    if n < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {value}")
+    return n
+
 def main():
     parser = argparse.ArgumentParser(description="OpenClaw Task Tracker")
     subparsers = parser.add_subparsers(dest="command")
@@ -114,23 +1094,68 @@ def main():
     p_list = subparsers.add_parser("list")
     p_list.add_argument("--project")
     p_list.add_argument("--state")
+    p_list.add_argument("--archived", action="store_true",
+                        help="List every archived task (oldest first) instead of the hot set")
+    p_list.add_argument("--since", help="Only tasks updated at or after this ISO date (created, with --archived)")
+    p_list.add_argument("--until", help="Only tasks updated before this ISO date (created, with --archived)")
+    p_list.add_argument("--limit", type=non_negative_int,
+                        help="Page size; 0 for no limit (default: 10, or all with --archived)")
+    p_list.add_argument("--offset", type=non_negative_int, default=0)
+    p_list.add_argument("--cursor", help="Continue after this task id (the last one of the previous page)")
+    p_list.add_argument("--format", dest="fmt", choices=["table", "json", "jsonl"], default="table")
 
     # Show
     p_show = subparsers.add_parser("show")
     p_show.add_argument("task_id")
 
+    # Time-in-state percentiles, throughput and failure rate
+    p_stats = subparsers.add_parser("stats")
+    p_stats.add_argument("--project")
+    p_stats.add_argument("--model")
+    p_stats.add_argument("--since", help="Only tasks updated at or after this ISO date (created, with --archived)")
+    p_stats.add_argument("--archived", action="store_true", help="Include archived history")
+    p_stats.add_argument("--format", dest="fmt", choices=["table", "json"], default="table")
+
+    # JSONL create/update operations on stdin, applied under one lock and one write
+    subparsers.add_parser("batch")
+
+    # One-shot migration of tasks.json into the SQLite backend
+    p_import = subparsers.add_parser("import-json")
+    p_import.add_argument("--file", default=DATA_FILE)
+
+    # Fold the journal backend's event log into tasks.json now
+    subparsers.add_parser("compact")
+
+    # Keep the task set in memory behind a Unix socket
+    subparsers.add_parser("serve")
+
     args = parser.parse_args()
 
-    if args.command == "create":
-        create_task(args.project, args.description, args.model)
-    elif args.command == "update":
-        update_task(args.task_id, args.state, args.commit, args.error)
-    elif args.command == "list":
-        list_tasks(args.project, args.state)
-    elif args.command == "show":
-        show_task(args.task_id)
-    else:
-        parser.print_help()
+    try:
+        if args.command == "create":
+            create_task(args.project, args.description, args.model)
+        elif args.command == "update":
+            update_task(args.task_id, args.state, args.commit, args.error)
+        elif args.command == "list":
+            list_tasks(args.project, args.state, args.archived, args.since, args.until,
+                       args.cursor, args.offset, args.limit, args.fmt)
+        elif args.command == "show":
+            show_task(args.task_id)
+        elif args.command == "batch":
+            batch_tasks(sys.stdin)
+        elif args.command == "stats":
+            stats_tasks(args.project, args.model, args.since, args.archived, args.fmt)
+        elif args.command == "import-json":
+            import_json(args.file)
+        elif args.command == "compact":
+            compact_journal()
+        elif args.command == "serve":
+            serve()
+        else:
+            parser.print_help()
+    except TaskStoreError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()